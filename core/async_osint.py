@@ -0,0 +1,178 @@
+"""
+Async OSINT Module - asyncio-native domain reconnaissance
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from core.osint_module import OSINTModule
+from utils.async_client import AsyncHTTPClient
+
+class AsyncOSINTModule(OSINTModule):
+    """OSINTModule whose scan() is a coroutine.
+
+    DNS, TLS and HTTP probes run natively on the event loop, so one process
+    can keep thousands of probes in flight across many domains. DNS goes
+    through the shared caching resolver and TLS through the shared TLS
+    probe, so results and caches match the synchronous module. WHOIS and
+    the deep-scan checks run on a bounded thread pool. Use scan_sync() from
+    synchronous code.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self._executor = None
+        self._http = None
+        self._slots = None
+
+    def _setup(self):
+        if self._slots is None:
+            self._executor = ThreadPoolExecutor(max_workers=int(self.config.get('async_thread_workers') or 32))
+            self._http = AsyncHTTPClient(self.config, executor=self._executor)
+            self._slots = asyncio.Semaphore(int(self.config.get('async_max_in_flight') or 1000))
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = self._http = self._slots = None
+
+    async def _probe(self, coro):
+        # Every probe holds a slot, bounding work in flight across all targets
+        async with self._slots:
+            try:
+                timeout = self.config.get('probe_timeout')
+                return await asyncio.wait_for(coro, timeout) if timeout else await coro
+            except asyncio.TimeoutError:
+                return {'error': f'Probe timed out after {timeout}s'}
+            except Exception as e:
+                return {'error': str(e)}
+
+    async def _in_thread(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def scan(self, target):
+        self._setup()
+        probes = {
+            'whois': self._in_thread(self.whois_lookup, target),
+            'dns': self.dns_enumeration_async(target),
+            'dnssec': self.detect_dnssec_async(target),
+            'subdomains': self.find_subdomains_async(target),
+            'ip_info': self.get_ip_info_async(target),
+            'ssl_info': self.get_ssl_info_async(target),
+            'headers': self.get_http_headers_async(target)
+        }
+        if self.config.get('deep_scan'):
+            # A private instance keeps each target's response cache separate
+            probes['advanced'] = self._in_thread(OSINTModule(self.config).deep_scan_features, target)
+
+        values = await asyncio.gather(*(self._probe(coro) for coro in probes.values()))
+        results = {
+            'target': target,
+            'timestamp': datetime.now().isoformat()
+        }
+        results.update(zip(probes, values))
+        self.results = results
+        return results
+
+    async def scan_many(self, targets, max_targets=None):
+        """Scan targets concurrently, yielding each result as it finishes.
+
+        `targets` may be any iterable and is consumed lazily; at most
+        `max_targets` (default `async_max_targets`) scans are open at once.
+        """
+        self._setup()
+        limit = int(max_targets or self.config.get('async_max_targets') or 100)
+        pending = set()
+        for target in targets:
+            pending.add(asyncio.ensure_future(self.scan(target)))
+            if len(pending) >= limit:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+    def scan_sync(self, target):
+        async def run():
+            try:
+                return await self.scan(target)
+            finally:
+                await self.close()
+        return asyncio.run(run())
+
+    async def _cached(self, probe, target, compute):
+        # The same scan cache entries as the sync methods' @cached_probe
+        if self.scan_cache is None:
+            return await compute()
+        return await self.scan_cache.get_or_compute_async(probe, target, compute)
+
+    async def dns_enumeration_async(self, domain):
+        async def fetch():
+            return self._dns_records(await self.resolver.resolve_many_async(self._dns_queries(domain)))
+        return await self._cached('dns', domain, fetch)
+
+    async def detect_dnssec_async(self, domain):
+        answers = await self.resolver.resolve_many_async([(domain, 'DNSKEY'), (domain, 'DS')])
+        return self._dnssec_status(domain, answers)
+
+    async def find_subdomains_async(self, domain):
+        enumerator, labels = self._subdomain_enumerator()
+        return sorted([found['name'] async for found in enumerator.iter_subdomains_async(domain, labels)])
+
+    async def get_ip_info_async(self, target):
+        async def fetch():
+            try:
+                ip = await self.resolver.gethostbyname_async(target)
+                try:
+                    hostname = (await self.resolver.gethostbyaddr_async(ip))[0]
+                except Exception:
+                    hostname = None
+                if self.geoip is not None:
+                    geo_data = self.geoip.lookup(ip) or {}
+                else:
+                    try:
+                        geo_data = (await self._http.get(self._geolocation_url(ip), timeout=5)).json()
+                    except Exception:
+                        geo_data = {}
+                return self._ip_record(ip, hostname, geo_data)
+            except Exception as e:
+                return {'error': str(e)}
+        return await self._cached('ip_info', target, fetch)
+
+    async def get_ssl_info_async(self, domain):
+        async def fetch():
+            try:
+                return self._summarize_handshake(await self.tls_probe.handshake_async(domain, 443))
+            except Exception as e:
+                return {'error': str(e)}
+        return await self._cached('tls_certificate', domain, fetch)
+
+    async def enumerate_tls_async(self, target):
+        host = target
+        if host.startswith('http'):
+            host = host.split('://', 1)[1].split('/', 1)[0]
+        try:
+            handshake = await self.tls_probe.handshake_async(host, 443)
+            info = {'protocol': handshake['protocol'], 'cipher': handshake['cipher']}
+            if self.config.get('tls_matrix'):
+                info['matrix'] = await self._in_thread(self.tls_probe.enumerate_matrix, host, 443)
+            return info
+        except Exception as e:
+            return {'protocol': None, 'cipher': None, 'error': str(e)}
+
+    async def get_http_headers_async(self, target):
+        if not target.startswith('http'):
+            target = f'https://{target}'
+        response = await self._http.get(target, timeout=10, allow_redirects=True)
+        return {
+            'url': target,
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'cookies': dict(response.cookies),
+            'redirects': response.history
+        }
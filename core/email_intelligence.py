@@ -3,14 +3,18 @@ Email Intelligence Module - Email investigation and validation
 """
 
 import re
-import dns.resolver
-import requests
 from datetime import datetime
 import hashlib
 
+from utils.http_client import get_session
+from utils.rate_limiter import get_rate_limiter
+from utils.dns_resolver import get_resolver
+
 class EmailIntelligence:
     def __init__(self, config):
         self.config = config
+        self.resolver = get_resolver(config)
+        self.rate_limiter = get_rate_limiter(config)
         
     def investigate(self, email):
         results = {
@@ -44,7 +48,7 @@ class EmailIntelligence:
         domain = email.split('@')[1]
         
         try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
+            mx_records = self.resolver.resolve(domain, 'MX')
             return {
                 'valid': True,
                 'mx_records': [str(mx.exchange) for mx in mx_records]
@@ -81,7 +85,8 @@ class EmailIntelligence:
                     'hibp-api-key': api_key,
                     'User-Agent': self.config.get('user_agent', 'Pegasus-OSINT/1.0')
                 }
-                response = requests.get(
+                self.rate_limiter.acquire('haveibeenpwned.com')
+                response = get_session(self.config).get(
                     f'https://haveibeenpwned.com/api/v3/breachedaccount/{email}',
                     headers=headers,
                     timeout=10
@@ -158,7 +163,8 @@ class EmailIntelligence:
         profiles = []
         
         try:
-            response = requests.get(
+            self.rate_limiter.acquire('api.fullcontact.com')
+            response = get_session(self.config).get(
                 'https://api.fullcontact.com/v3/person.enrich',
                 headers={'Authorization': f'Bearer {self.config.get("api_keys", {}).get("fullcontact", "")}'},
                 json={'email': email},
@@ -177,7 +183,7 @@ class EmailIntelligence:
         domain = email.split('@')[1]
         result = {'spf': None, 'dmarc': None, 'dmarc_grade': None}
         try:
-            txt = dns.resolver.resolve(domain, 'TXT')
+            txt = self.resolver.resolve(domain, 'TXT')
             records = [str(rdata.strings[0].decode()) if hasattr(rdata, 'strings') and rdata.strings else str(rdata) for rdata in txt]
             spf_records = [t for t in records if 'v=spf1' in t]
             result['spf'] = spf_records[0] if spf_records else None
@@ -185,7 +191,7 @@ class EmailIntelligence:
             result['spf'] = None
         try:
             dmarc_domain = f'_dmarc.{domain}'
-            txt = dns.resolver.resolve(dmarc_domain, 'TXT')
+            txt = self.resolver.resolve(dmarc_domain, 'TXT')
             dmarc_records = [str(rdata.strings[0].decode()) if hasattr(rdata, 'strings') and rdata.strings else str(rdata) for rdata in txt]
             dmarc_policy = None
             if dmarc_records:
@@ -209,7 +215,7 @@ class EmailIntelligence:
     def analyze_mx(self, email):
         domain = email.split('@')[1]
         try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
+            mx_records = self.resolver.resolve(domain, 'MX')
             entries = []
             for mx in mx_records:
                 preference = getattr(mx, 'preference', 0)
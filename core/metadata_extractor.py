@@ -2,16 +2,26 @@
 Metadata Extractor Module - Extract metadata from various file types
 """
 
+import hashlib
 import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from PIL import Image
 from PIL.ExifTags import TAGS, GPSTAGS
 import PyPDF2
 import json
 
+from utils.entropy import ByteHistogram, EntropyProfile
+from utils.extraction_index import get_extraction_index, file_key
+
 class MetadataExtractor:
+    CHUNK_SIZE = 1024 * 1024
+    
     def __init__(self, config):
         self.config = config
+        self.chunk_size = int(config.get('metadata_chunk_size') or self.CHUNK_SIZE)
+        self.index = get_extraction_index(config)
         
     def extract(self, file_path):
         if not os.path.exists(file_path):
@@ -30,6 +40,7 @@ class MetadataExtractor:
         }
         
         extractor = extractors.get(file_extension, self.extract_generic_metadata)
+        digest = self.digest_file(file_path)
         
         results = {
             'file_path': file_path,
@@ -38,11 +49,13 @@ class MetadataExtractor:
             'file_type': file_extension,
             'timestamp': datetime.now().isoformat(),
             'basic_info': self.get_basic_file_info(file_path),
-            'hashes': self.compute_hashes(file_path),
-            'mime_signature': self.detect_mime_signature(file_path),
-            'entropy': self.compute_entropy(file_path),
+            'hashes': digest['hashes'],
+            'mime_signature': digest['mime_signature'],
+            'entropy': digest['entropy'],
             'metadata': extractor(file_path)
         }
+        if 'entropy_profile' in digest:
+            results['entropy_profile'] = digest['entropy_profile']
         
         return results
     
@@ -175,54 +188,194 @@ class MetadataExtractor:
         }
     
     def extract_all_metadata(self, directory):
-        results = []
-        
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                results.append(self.extract(file_path))
-        
+        results = list(self.iter_extract_all(directory))
+        originals = {r.get('file_path'): r for r in results if 'duplicate_of' not in r}
+        for result in results:
+            original = originals.get(result.get('duplicate_of'))
+            if original is not None:
+                original.setdefault('duplicate_paths', []).append(result['file_path'])
         return results
     
-    def compute_hashes(self, file_path):
-        import hashlib
-        hashes = {'md5': None, 'sha1': None, 'sha256': None}
+    def iter_files(self, directory):
+        """Yield every file path under directory without following symlinked dirs."""
+        stack = [directory]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    subdirs = []
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                            elif not entry.is_dir():
+                                yield entry.path
+                        except OSError:
+                            continue
+                    stack.extend(reversed(subdirs))
+            except OSError:
+                continue
+    
+    def iter_extract_all(self, directory, workers=None, ordered=None):
+        """Extract every file under directory, yielding results as they are ready."""
+        workers = int(workers or self.config.get('metadata_workers') or os.cpu_count() or 1)
+        if ordered is None:
+            ordered = self.config.get('metadata_ordered', True)
+        paths = self.iter_files(directory)
+        duplicates = DuplicateFinder(self.chunk_size) if self.config.get('metadata_dedup', True) else None
+        try:
+            if workers <= 1:
+                for path in paths:
+                    key, ready = self._prepare(path, duplicates)
+                    yield ready if ready is not None else self._store(path, key, self.extract(path))
+            else:
+                yield from self._extract_pool(paths, workers, ordered, duplicates)
+            if self.index is not None:
+                self.index.purge_missing(os.path.abspath(directory))
+        finally:
+            if self.index is not None:
+                self.index.flush()
+    
+    def _extract_pool(self, paths, workers, ordered, duplicates):
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.config,)) as pool:
+            pending = deque()
+            stores = {}
+            for path in paths:
+                key, ready = self._prepare(path, duplicates)
+                if ready is not None:
+                    # Already-finished future, so index hits and duplicates keep their place in ordered mode
+                    future = Future()
+                    future.set_result(ready)
+                else:
+                    future = pool.submit(_extract_in_worker, path)
+                    stores[future] = (path, key)
+                pending.append(future)
+                if len(pending) >= workers * 4:
+                    for future in self._drain(pending, ordered, workers * 4 - 1):
+                        yield self._store(*stores.pop(future, (None, None)), future.result())
+            for future in self._drain(pending, ordered, 0):
+                yield self._store(*stores.pop(future, (None, None)), future.result())
+    
+    @staticmethod
+    def _drain(pending, ordered, keep):
+        while len(pending) > keep:
+            if ordered:
+                yield pending.popleft()
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield future
+    
+    def _prepare(self, path, duplicates):
+        """(file key, result) when path needs no extraction, else (file key, None)."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None, None
+        key, cached = self._indexed(path, stat)
+        if duplicates is None:
+            return key, cached
+        if cached is not None:
+            duplicates.add_known(path, cached.get('file_size'), (cached.get('hashes') or {}).get('sha256'))
+            return key, cached
+        found = duplicates.check(path, stat.st_size)
+        if found is None:
+            return key, None
+        # Duplicate records are not indexed: they are only valid while the original is unchanged
+        return None, self.duplicate_record(path, *found)
+    
+    def duplicate_record(self, path, original, sha256):
+        return {
+            'file_path': path,
+            'file_name': os.path.basename(path),
+            'file_size': os.path.getsize(path),
+            'file_type': os.path.splitext(path)[1].lower(),
+            'timestamp': datetime.now().isoformat(),
+            'basic_info': self.get_basic_file_info(path),
+            'hashes': {'sha256': sha256},
+            'duplicate_of': original
+        }
+    
+    def _indexed(self, path, stat):
+        """(file key, stored result or None) for path; (None, None) without an index."""
+        if self.index is None:
+            return None, None
+        key = file_key(stat)
+        cached = self.index.get(os.path.abspath(path), key)
+        if cached is not None and 'duplicate_of' in cached:
+            return key, None
+        return key, cached
+    
+    def _store(self, path, key, result):
+        # The key is taken before extraction, so a file changed mid-read is re-extracted next run
+        if key is not None and 'error' not in result:
+            self.index.set(os.path.abspath(path), key, result)
+        return result
+    
+    def digest_file(self, file_path):
+        """Hashes, byte entropy and signature from a single chunked read."""
+        hashers = {'md5': hashlib.md5(), 'sha1': hashlib.sha1(), 'sha256': hashlib.sha256()}
+        histogram = ByteHistogram()
+        window = int(self.config.get('entropy_window') or 0)
+        profile = EntropyProfile(window, self.config.get('entropy_step')) if window else None
+        header = b''
         try:
             with open(file_path, 'rb') as f:
-                data = f.read()
-                hashes['md5'] = hashlib.md5(data).hexdigest()
-                hashes['sha1'] = hashlib.sha1(data).hexdigest()
-                hashes['sha256'] = hashlib.sha256(data).hexdigest()
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if not histogram.total:
+                        header = chunk[:8]
+                    for hasher in hashers.values():
+                        hasher.update(chunk)
+                    histogram.update(chunk)
+                    if profile is not None:
+                        profile.update(chunk)
         except Exception as e:
-            hashes['error'] = str(e)
-        return hashes
+            error = {'error': str(e)}
+            return {'hashes': {'md5': None, 'sha1': None, 'sha256': None, 'error': str(e)},
+                    'mime_signature': error, 'entropy': error}
+        digest = {
+            'hashes': {name: hasher.hexdigest() for name, hasher in hashers.items()},
+            'mime_signature': self._mime_from_header(header),
+            'entropy': round(histogram.entropy(), 4)
+        }
+        if profile is not None:
+            digest['entropy_profile'] = profile.finish()
+        return digest
+    
+    @staticmethod
+    def _mime_from_header(header):
+        mime = 'application/octet-stream'
+        if header.startswith(b'\xFF\xD8'):
+            mime = 'image/jpeg'
+        elif header.startswith(b'\x89PNG'):
+            mime = 'image/png'
+        elif header.startswith(b'%PDF'):
+            mime = 'application/pdf'
+        return {'signature': header.hex(), 'mime': mime}
+    
+    def compute_hashes(self, file_path):
+        return self.digest_file(file_path)['hashes']
     
     def detect_mime_signature(self, file_path):
         try:
             with open(file_path, 'rb') as f:
-                header = f.read(8)
-            sig = header.hex()
-            mime = 'application/octet-stream'
-            if header.startswith(b'\xFF\xD8'):
-                mime = 'image/jpeg'
-            elif header.startswith(b'\x89PNG'):
-                mime = 'image/png'
-            elif header.startswith(b'%PDF'):
-                mime = 'application/pdf'
-            return {'signature': sig, 'mime': mime}
+                return self._mime_from_header(f.read(8))
         except Exception as e:
             return {'error': str(e)}
     
     def compute_entropy(self, file_path):
+        return self.digest_file(file_path)['entropy']
+    
+    def compute_entropy_profile(self, file_path, window=4096, step=None):
         try:
-            import math
-            from collections import Counter
+            profile = EntropyProfile(window, step)
             with open(file_path, 'rb') as f:
-                data = f.read()
-            counts = Counter(data)
-            total = len(data) if data else 1
-            entropy = -sum((c/total) * math.log2(c/total) for c in counts.values())
-            return round(entropy, 4)
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    profile.update(chunk)
+            return profile.finish()
         except Exception as e:
             return {'error': str(e)}
     
@@ -240,3 +393,85 @@ class MetadataExtractor:
         except Exception:
             pass
         return False
+
+class DuplicateFinder:
+    """Recognizes files whose content was already seen in this crawl."""
+    
+    SAMPLE = 64 * 1024
+    
+    def __init__(self, chunk_size=MetadataExtractor.CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._sizes = {}  # size -> the one unread path of that size, None once sampled
+        self._samples = {}  # (size, sample sha256) -> [first path, its full sha256 or None]
+        self._contents = {}  # full sha256 -> first path
+        self._known_sizes = set()  # sizes of files registered with add_known()
+    
+    def add_known(self, path, size, sha256):
+        """Register a file whose full hash is already known."""
+        if size is not None and sha256:
+            self._contents.setdefault(sha256, path)
+            self._known_sizes.add(size)
+            self._sizes.setdefault(size, None)
+    
+    def check(self, path, size):
+        """(first path, sha256) if path repeats earlier content, else None."""
+        if size not in self._sizes:
+            self._sizes[size] = path
+            return None
+        first = self._sizes[size]
+        if first is not None:
+            self._sizes[size] = None
+            try:
+                self._match(first, size)
+            except OSError:
+                pass
+        try:
+            return self._match(path, size)
+        except OSError:
+            return None
+    
+    def _match(self, path, size):
+        sample, whole = self._sample(path, size)
+        entry = self._samples.get((size, sample))
+        if entry is None:
+            entry = self._samples[(size, sample)] = [path, sample if whole else None]
+            if not whole and size not in self._known_sizes:
+                return None
+            full = entry[1] = sample if whole else self._sha256(path)
+        else:
+            full = sample if whole else self._sha256(path)
+            if entry[1] is None:
+                try:
+                    entry[1] = self._sha256(entry[0])
+                    self._contents.setdefault(entry[1], entry[0])
+                except OSError:
+                    entry[1] = ''
+        original = self._contents.setdefault(full, path)
+        return (original, full) if original != path else None
+    
+    def _sample(self, path, size):
+        with open(path, 'rb') as f:
+            if size <= 2 * self.SAMPLE:
+                return hashlib.sha256(f.read()).hexdigest(), True
+            head = f.read(self.SAMPLE)
+            f.seek(-self.SAMPLE, os.SEEK_END)
+            return hashlib.sha256(head + f.read(self.SAMPLE)).hexdigest(), False
+    
+    def _sha256(self, path):
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+_worker_extractor = None
+
+def _init_worker(config):
+    global _worker_extractor
+    _worker_extractor = MetadataExtractor(config)
+
+def _extract_in_worker(file_path):
+    try:
+        return _worker_extractor.extract(file_path)
+    except Exception as e:
+        return {'file_path': file_path, 'error': str(e)}
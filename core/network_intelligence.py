@@ -3,15 +3,40 @@ Network Intelligence Module - Network reconnaissance and port scanning
 """
 
 import socket
-import subprocess
 from datetime import datetime
 import ipaddress
+import itertools
+import os
 import struct
 import select
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import dns.name
+import dns.reversename
+
+from utils.dns_resolver import get_resolver
+from utils.entropy import shannon_entropy
+from utils.geoip import get_geoip
+from utils.latency import LatencyProber, parse_packet_loss, parse_ping_time
+from utils.http_client import get_session
+from utils.rate_limiter import get_rate_limiter
+from utils.port_scanner import PortScanner, parse_ports
+from utils.tls_probe import get_tls_probe
+from utils.tracer import Hop, Tracer, parse_traceroute_output
 
 class NetworkIntelligence:
+    TLS_PORTS = (443, 8443, 9443)
+    HTTP_PORTS = (80, 8000, 8008, 8080, 8888)
+    SMTP_PORTS = (25, 587)
+    MAX_HELD_SOCKETS = 256
+    DISCOVERY_PORTS = [22, 80, 443, 445, 3389]
+    
     def __init__(self, config):
         self.config = config
+        self.resolver = get_resolver(config)
+        self.geoip = get_geoip(config)
+        self.tls_probe = get_tls_probe(config)
+        self.rate_limiter = get_rate_limiter(config)
         self.common_ports = [
             21, 22, 23, 25, 53, 80, 110, 111, 135, 139, 143, 443,
             445, 993, 995, 1723, 3306, 3389, 5900, 8080, 8443
@@ -42,7 +67,7 @@ class NetworkIntelligence:
     
     def get_host_info(self, ip):
         try:
-            hostname = socket.gethostbyaddr(ip)[0]
+            hostname = self.resolver.gethostbyaddr(ip)[0]
             return {
                 'ip': ip,
                 'hostname': hostname,
@@ -73,45 +98,26 @@ class NetworkIntelligence:
             return False
     
     def ping_host(self, target):
+        return self.ping_hosts([target])[target]
+    
+    def ping_hosts(self, targets):
         try:
-            param = '-n' if subprocess.os.name == 'nt' else '-c'
-            command = ['ping', param, '4', target]
-            output = subprocess.run(command, capture_output=True, text=True, timeout=10)
-            
-            return {
-                'success': output.returncode == 0,
-                'output': output.stdout,
-                'response_time': self.parse_ping_time(output.stdout),
-                'packet_loss': self.parse_packet_loss(output.stdout)
-            }
+            return LatencyProber.from_config(self.config).probe_many(targets)
         except Exception as e:
-            return {
-                'success': False,
-                'error': str(e)
-            }
+            return {target: {'success': False, 'error': str(e)} for target in targets}
     
     def parse_ping_time(self, output):
-        import re
-        time_match = re.search(r'time[=<](\d+\.?\d*)', output)
-        if time_match:
-            return float(time_match.group(1))
-        return None
+        return parse_ping_time(output)
     
     def parse_packet_loss(self, output):
-        import re
-        m = re.search(r'(\d+)%\s*packet loss', output)
-        if not m:
-            m = re.search(r'Lost = \d+ \((\d+)%\)', output)
-        return int(m.group(1)) if m else None
+        return parse_packet_loss(output)
     
     def traceroute(self, target):
         try:
-            command = ['traceroute', target] if subprocess.os.name != 'nt' else ['tracert', target]
-            output = subprocess.run(command, capture_output=True, text=True, timeout=30)
-            hops = self.parse_traceroute(output.stdout)
+            hops, reached = Tracer.from_config(self.config).trace(target)
             result = {
-                'success': output.returncode == 0,
-                'hops': hops
+                'success': reached,
+                'hops': [hop.to_dict() for hop in hops]
             }
             if self.config.get('deep_scan'):
                 result['hop_geolocation'] = self.geolocate_hops(hops)
@@ -123,22 +129,34 @@ class NetworkIntelligence:
             }
     
     def parse_traceroute(self, output):
-        hops = []
-        for line in output.split('\n'):
-            if line.strip() and not line.startswith('traceroute'):
-                hops.append(line.strip())
-        return hops
+        return parse_traceroute_output(output)
     
     def geolocate_hops(self, hops):
-        import re, requests
+        import re
+        ips = []
+        for h in hops:
+            if isinstance(h, Hop):
+                ip = h.ip
+            elif isinstance(h, dict):
+                ip = h.get('ip')
+            else:
+                found = re.findall(r'(\d+\.\d+\.\d+\.\d+)', h)
+                ip = found[-1] if found else None
+            if ip and not self.is_private_or_bogon(ip):
+                ips.append(ip)
+        
+        if self.geoip is not None:
+            return [
+                {'ip': ip, 'city': data.get('city'), 'country': data.get('country_name'), 'asn': data.get('asn')}
+                for ip, data in self.geoip.lookup_many(ips).items() if data
+            ]
+        
         geo = []
-        for h in hops[:10]:
-            ips = re.findall(r'(\d+\.\d+\.\d+\.\d+)', h)
-            if not ips:
-                continue
-            ip = ips[-1]
+        for ip in ips[:10]:
             try:
-                r = requests.get(f'https://ipapi.co/{ip}/json/', timeout=5)
+                url = f'https://ipapi.co/{ip}/json/'
+                self.rate_limiter.acquire(url)
+                r = get_session(self.config).get(url, timeout=5)
                 if r.status_code == 200:
                     data = r.json()
                     geo.append({'ip': ip, 'city': data.get('city'), 'country': data.get('country_name')})
@@ -148,27 +166,28 @@ class NetworkIntelligence:
     
     def port_scan(self, target_ip, ports=None):
         if ports is None:
-            ports = self.common_ports
+            ports = self.config.get('ports') or self.common_ports
+        ports = parse_ports(ports)
+        
+        scanner = PortScanner.from_config(self.config)
+        scanned = scanner.scan(target_ip, ports, keep_open=True, max_open=self.MAX_HELD_SOCKETS)
         
         results = {
             'open_ports': [],
-            'closed_ports': [],
-            'filtered_ports': []
+            'closed_ports': [r.port for r in scanned['closed']],
+            'filtered_ports': [r.port for r in scanned['filtered']]
         }
         
-        for port in ports:
-            status = self.check_port(target_ip, port)
-            if status == 'open':
-                service = self.identify_service(target_ip, port)
-                enriched = self.enrich_service_info(target_ip, port, service)
-                results['open_ports'].append({
-                    'port': port,
-                    'service': enriched
-                })
-            elif status == 'closed':
-                results['closed_ports'].append(port)
-            else:
-                results['filtered_ports'].append(port)
+        open_found = scanned['open']
+        with ThreadPoolExecutor(max_workers=min(max(len(open_found), 1), 32)) as pool:
+            services = list(pool.map(lambda r: self.identify_service(target_ip, r.port, r.sock), open_found))
+        
+        for found, service in zip(open_found, services):
+            enriched = self.enrich_service_info(target_ip, found.port, service)
+            results['open_ports'].append({
+                'port': found.port,
+                'service': enriched
+            })
         
         return results
     
@@ -197,15 +216,9 @@ class NetworkIntelligence:
             return 'closed'
     
     def banner_entropy(self, banner):
-        if not banner:
-            return 0.0
-        import math
-        from collections import Counter
-        counts = Counter(banner)
-        total = sum(counts.values())
-        return -sum((c/total) * math.log2(c/total) for c in counts.values())
-    
-    def identify_service(self, ip, port):
+        return shannon_entropy(banner)
+    
+    def identify_service(self, ip, port, sock=None):
         service_map = {
             21: 'FTP',
             22: 'SSH',
@@ -225,28 +238,78 @@ class NetworkIntelligence:
         }
         
         service = service_map.get(port, 'Unknown')
+        info = {'name': service, 'banner': None}
         
+        # An already-connected socket from the scanner is reused, so an open
+        # port costs one connection for connect check, banner and TLS
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)
-            sock.connect((ip, port))
-            banner = sock.recv(1024).decode('utf-8', errors='ignore').strip()
-            sock.close()
-            
-            return {
-                'name': service,
-                'banner': banner
-            }
-        except:
-            return {
-                'name': service,
-                'banner': None
-            }
+            if sock is None:
+                sock = socket.create_connection((ip, port), timeout=2)
+            sock.settimeout(float(self.config.get('banner_timeout', 2)))
+            if port in self.TLS_PORTS:
+                sock, info['tls'] = self._start_tls(sock, ip, port)
+                if 'error' not in info['tls']:
+                    info['banner'] = self._http_head(sock, ip)
+            else:
+                info['banner'] = self._read_banner(sock, ip, port)
+        except Exception:
+            pass
+        finally:
+            if sock is not None:
+                sock.close()
+        return info
+    
+    def _read_banner(self, sock, ip, port):
+        nudges = self.config.get('banner_nudges', True)
+        if nudges and port in self.HTTP_PORTS:
+            # HTTP servers never speak first; ask straight away
+            return self._http_head(sock, ip)
+        try:
+            banner = sock.recv(1024)
+        except socket.timeout:
+            banner = b''
+        if nudges and banner.startswith(b'220') and port in self.SMTP_PORTS:
+            sock.sendall(b'EHLO pegasus.local\r\n')
+            banner += self._recv_quietly(sock)
+            sock.sendall(b'QUIT\r\n')
+        elif nudges and not banner:
+            return self._http_head(sock, ip)
+        return banner.decode('utf-8', errors='ignore').strip()
+    
+    def _http_head(self, sock, host):
+        sock.sendall(f'HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: {self.config.get("user_agent", "Pegasus-OSINT/1.0")}\r\n\r\n'.encode())
+        return self._recv_quietly(sock).decode('utf-8', errors='ignore').strip() or None
+    
+    def _recv_quietly(self, sock, size=1024):
+        try:
+            return sock.recv(size)
+        except (socket.timeout, OSError):
+            return b''
+    
+    def _start_tls(self, sock, host, port):
+        try:
+            ssock, handshake = self.tls_probe.wrap(sock, host, port)
+            return ssock, self._summarize_tls_certificate(handshake)
+        except Exception as e:
+            return sock, {'error': str(e)}
+    
+    def _summarize_tls_certificate(self, handshake):
+        cert = handshake['certificate']
+        return {
+            'subject': dict(x[0] for x in cert.get('subject', [])),
+            'issuer': dict(x[0] for x in cert.get('issuer', [])),
+            'not_after': cert.get('notAfter'),
+            'fingerprint_sha256': handshake['fingerprint_sha256'],
+            'verified': handshake['verified'],
+            'verify_error': handshake['verify_error'],
+            'protocol': handshake['protocol'],
+            'cipher': handshake['cipher']
+        }
     
     def enrich_service_info(self, ip, port, service_info):
         enriched = dict(service_info)
         enriched['entropy'] = self.banner_entropy(service_info.get('banner'))
-        if port in (443, 8443, 9443):
+        if port in self.TLS_PORTS and 'tls' not in enriched:
             enriched['tls'] = self.capture_tls_certificate(ip, port)
         if port in (139, 445):
             enriched['smb_hint'] = 'SMB related port open'
@@ -254,16 +317,7 @@ class NetworkIntelligence:
     
     def capture_tls_certificate(self, host, port):
         try:
-            import ssl
-            context = ssl.create_default_context()
-            with socket.create_connection((host, port), timeout=5) as sock:
-                with context.wrap_socket(sock, server_hostname=host) as ssock:
-                    cert = ssock.getpeercert()
-                    return {
-                        'subject': dict(x[0] for x in cert.get('subject', [])),
-                        'issuer': dict(x[0] for x in cert.get('issuer', [])),
-                        'not_after': cert.get('notAfter')
-                    }
+            return self._summarize_tls_certificate(self.tls_probe.handshake(host, port))
         except Exception as e:
             return {'error': str(e)}
     
@@ -271,21 +325,28 @@ class NetworkIntelligence:
         open_ports = [p['port'] for p in ports_result.get('open_ports', [])] if isinstance(ports_result, dict) else []
         return {'smb_present': any(p in (139, 445) for p in open_ports)}
     
-    def reverse_dns_sweep(self, ip, limit=16):
+    def reverse_dns_sweep(self, ip, limit=16, prefix=None):
         try:
             ip_addr = ipaddress.ip_address(ip)
-            network = ipaddress.ip_network(f"{ip_addr}/24", strict=False)
-            results = []
-            for host in list(network.hosts())[:limit]:
-                try:
-                    name = socket.gethostbyaddr(str(host))[0]
-                    results.append({'ip': str(host), 'hostname': name})
-                except Exception:
-                    continue
-            return results
+            prefix = prefix or (24 if ip_addr.version == 4 else 120)
+            network = ipaddress.ip_network(f"{ip_addr}/{prefix}", strict=False)
+            results = list(self.iter_reverse_dns(network, limit))
+            return sorted(results, key=lambda r: ipaddress.ip_address(r['ip']))
         except Exception as e:
             return {'error': str(e)}
     
+    def iter_reverse_dns(self, cidr, limit=None):
+        """Yield {'ip', 'hostname'} for every address in a prefix with a PTR record."""
+        network = ipaddress.ip_network(str(cidr), strict=False)
+        hosts = itertools.islice(network.hosts(), limit)
+        queries = ((dns.reversename.from_address(str(host)).to_text(), 'PTR') for host in hosts)
+        for name, _, rdatas, error in self.resolver.iter_resolve(queries):
+            if error is None and rdatas:
+                yield {
+                    'ip': dns.reversename.to_address(dns.name.from_text(name)),
+                    'hostname': str(rdatas[0]).rstrip('.')
+                }
+    
     def snmp_public_check(self, ip):
         # Placeholder safe check
         return {'checked': False, 'note': 'SNMP check disabled by default'}
@@ -301,7 +362,64 @@ class NetworkIntelligence:
                 'netmask': str(network.netmask),
                 'broadcast': str(network.broadcast_address),
                 'num_addresses': network.num_addresses,
-                'hosts': [str(ip) for ip in list(network.hosts())[:10]]
+                'hosts': [str(ip) for ip in itertools.islice(network.hosts(), 10)]
             }
         except Exception as e:
             return {'error': str(e)}
+    
+    def discover_hosts(self, cidr, ports=None):
+        """Yield a liveness record for each responsive host in a range."""
+        network = self._authorized_network(cidr)
+        ports = parse_ports(ports or self.config.get('discovery_ports') or self.DISCOVERY_PORTS)
+        scanner = PortScanner.from_config(self.config)
+        probes = ((str(host), port) for host in network.hosts() for port in ports)
+        seen = set()
+        for result in scanner.iter_scan(probes):
+            if result.state in ('open', 'closed') and result.host not in seen:
+                seen.add(result.host)
+                yield {'ip': result.host, 'alive': True, 'discovery': result.to_dict()}
+    
+    def scan_network(self, cidr, scan_ports=False, ports=None):
+        """Discover live hosts in a range, then port scan them on a process pool."""
+        live = self.discover_hosts(cidr)
+        if not scan_ports:
+            yield from live
+            return
+        
+        workers = int(self.config.get('range_workers') or os.cpu_count() or 1)
+        shard_size = int(self.config.get('range_shard_size') or 16)
+        ports = ports or self.config.get('ports') or self.common_ports
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            shard = []
+            for host in live:
+                shard.append(host)
+                if len(shard) >= shard_size:
+                    pending.add(pool.submit(_scan_shard, self.config, shard, ports))
+                    shard = []
+                while len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            if shard:
+                pending.add(pool.submit(_scan_shard, self.config, shard, ports))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+    
+    def _authorized_network(self, cidr):
+        network = ipaddress.ip_network(cidr, strict=False)
+        if not (network.is_private or self.config.get('allow_public_ranges')):
+            raise ValueError(f'{network} is not an internal range; set allow_public_ranges for authorized public scans')
+        return network
+
+def _scan_shard(config, hosts, ports):
+    # Runs in a worker process; keep it module-level so it pickles
+    network = NetworkIntelligence(config)
+    results = []
+    for host in hosts:
+        record = dict(host)
+        record['ports'] = network.port_scan(host['ip'], ports)
+        results.append(record)
+    return results
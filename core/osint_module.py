@@ -2,33 +2,55 @@
 OSINT Module - Domain and IP reconnaissance
 """
 
-import socket
 import whois
-import dns.resolver
-import requests
 from datetime import datetime
 import subprocess
 import re
 
+from utils.executor import TaskGraph
+from utils.http_cache import ResponseCache
+from utils.http_client import get_session
+from utils.rate_limiter import get_rate_limiter
+from utils.dns_resolver import get_resolver
+from utils.geoip import get_geoip
+from utils.scan_cache import cached_probe, get_scan_cache
+from utils.tls_probe import get_tls_probe
+from utils.subdomains import SubdomainEnumerator, iter_wordlist
+
+def _whois_date(value):
+    return str(value) if value is not None else None
+
 class OSINTModule:
     def __init__(self, config):
         self.config = config
         self.results = {}
+        self._response_cache = None
+        self.resolver = get_resolver(config)
+        self.scan_cache = get_scan_cache(config)
+        self.geoip = get_geoip(config)
+        self.tls_probe = get_tls_probe(config)
+        self.rate_limiter = get_rate_limiter(config)
         
     def _http_get(self, url, allow_redirects=True, timeout=None, stream=False):
+        # Within a scan, identical GETs are fetched once and shared by all probes
+        cache = self._response_cache
+        if cache is None or stream:
+            return self._http_request(url, allow_redirects, timeout, stream)
+        key = ResponseCache.make_key(url, 'GET', allow_redirects)
+        return cache.get_or_fetch(key, lambda: self._http_request(url, allow_redirects, timeout, stream))
+        
+    def _http_request(self, url, allow_redirects=True, timeout=None, stream=False):
         import time
         retries = int(self.config.get('retries', 2))
         backoff = float(self.config.get('backoff_factor', 0.5))
         timeout = timeout or int(self.config.get('timeout', 10))
         headers = {'User-Agent': self.config.get('user_agent', 'Pegasus-OSINT/1.0')}
         proxies = {'http': self.config.get('proxy'), 'https': self.config.get('proxy')} if self.config.get('proxy') else None
-        rate_limit = float(self.config.get('rate_limit', 0))
         last_ex = None
         for attempt in range(retries + 1):
             try:
-                if rate_limit and attempt == 0:
-                    time.sleep(1.0 / max(rate_limit, 1))
-                resp = requests.get(url, timeout=timeout, allow_redirects=allow_redirects, headers=headers, proxies=proxies, stream=stream)
+                self.rate_limiter.acquire(url)
+                resp = get_session(self.config).get(url, timeout=timeout, allow_redirects=allow_redirects, headers=headers, proxies=proxies, stream=stream)
                 if resp.status_code == 429 and attempt < retries:
                     time.sleep(backoff * (2 ** attempt))
                     continue
@@ -38,45 +60,83 @@ class OSINTModule:
                 time.sleep(backoff * (2 ** attempt))
         raise last_ex if last_ex else Exception('HTTP request failed')
         
+    SCAN_PROBES = [
+        ('whois', 'whois_lookup'),
+        ('dns', 'dns_enumeration'),
+        ('dnssec', 'detect_dnssec'),
+        ('subdomains', 'find_subdomains'),
+        ('ip_info', 'get_ip_info'),
+        ('ssl_info', 'get_ssl_info'),
+        ('headers', 'get_http_headers')
+    ]
+    
+    DEEP_SCAN_PROBES = [
+        ('http_versions', 'detect_http_versions'),
+        ('cdn', 'detect_cdn'),
+        ('waf', 'detect_waf'),
+        ('robots', 'fetch_robots_security'),
+        ('sitemap', 'fetch_sitemap'),
+        ('tls', 'enumerate_tls'),
+        ('hsts', 'check_hsts'),
+        ('open_redirect', 'check_open_redirects'),
+        ('email_auth', 'analyze_email_auth'),
+        ('cors', 'inspect_cors'),
+        ('csp', 'inspect_csp'),
+        ('tech_fingerprint', 'fingerprint_tech'),
+        ('favicon', 'favicon_hash'),
+        ('admin_paths', 'probe_admin_paths'),
+        ('canonical', 'extract_canonical_url'),
+        ('reverse_whois', 'reverse_whois')
+    ]
+    
+    COMMON_SUBDOMAINS = [
+        'www', 'mail', 'ftp', 'localhost', 'webmail', 'smtp',
+        'pop', 'ns1', 'webdisk', 'ns2', 'cpanel', 'whm',
+        'autodiscover', 'autoconfig', 'm', 'imap', 'test',
+        'ns', 'blog', 'pop3', 'dev', 'www2', 'admin',
+        'portal', 'ns3', 'dns1', 'api', 'cdn', 'vpn'
+    ]
+    
+    def _run_probes(self, target, probes):
+        # Probes are independent, so they share one pool sized by `concurrency`
+        graph = TaskGraph(max_workers=self.config.get('concurrency', 1), timeout=self.config.get('probe_timeout'))
+        for key, method in probes:
+            graph.add(key, getattr(self, method), target)
+        self._response_cache = ResponseCache()
+        try:
+            return graph.run()
+        finally:
+            self._response_cache = None
+        
     def scan(self, target):
+        probes = list(self.SCAN_PROBES)
+        if self.config.get('deep_scan'):
+            probes += [(f'advanced.{key}', method) for key, method in self.DEEP_SCAN_PROBES]
+        probe_results = self._run_probes(target, probes)
+        
         self.results = {
             'target': target,
-            'timestamp': datetime.now().isoformat(),
-            'whois': self.whois_lookup(target),
-            'dns': self.dns_enumeration(target),
-            'dnssec': self.detect_dnssec(target),
-            'subdomains': self.find_subdomains(target),
-            'ip_info': self.get_ip_info(target),
-            'ssl_info': self.get_ssl_info(target),
-            'headers': self.get_http_headers(target)
+            'timestamp': datetime.now().isoformat()
         }
+        advanced = {}
+        for key, value in probe_results.items():
+            if key.startswith('advanced.'):
+                advanced[key.split('.', 1)[1]] = value
+            else:
+                self.results[key] = value
         if self.config.get('deep_scan'):
-            self.results['advanced'] = self.deep_scan_features(target)
+            self.results['advanced'] = advanced
         return self.results
     
     def deep_scan_features(self, target):
-        info = {}
-        info['http_versions'] = self.detect_http_versions(target)
-        info['cdn'] = self.detect_cdn(target)
-        info['waf'] = self.detect_waf(target)
-        info['robots'] = self.fetch_robots_security(target)
-        info['sitemap'] = self.fetch_sitemap(target)
-        info['tls'] = self.enumerate_tls(target)
-        info['hsts'] = self.check_hsts(target)
-        info['open_redirect'] = self.check_open_redirects(target)
-        info['email_auth'] = self.analyze_email_auth(target)
-        info['cors'] = self.inspect_cors(target)
-        info['csp'] = self.inspect_csp(target)
-        info['tech_fingerprint'] = self.fingerprint_tech(target)
-        info['favicon'] = self.favicon_hash(target)
-        info['admin_paths'] = self.probe_admin_paths(target)
-        info['canonical'] = self.extract_canonical_url(target)
-        info['reverse_whois'] = self.reverse_whois(target)
-        return info
+        return self._run_probes(target, self.DEEP_SCAN_PROBES)
     
+    @cached_probe('whois')
     def whois_lookup(self, domain):
         try:
             w = whois.whois(domain)
+            if not w.domain_name:
+                return {'error': 'No WHOIS record found'}
             abuse_contact = None
             emails = w.emails
             if isinstance(emails, list):
@@ -89,8 +149,8 @@ class OSINTModule:
             return {
                 'domain_name': w.domain_name,
                 'registrar': w.registrar,
-                'creation_date': str(w.creation_date),
-                'expiration_date': str(w.expiration_date),
+                'creation_date': _whois_date(w.creation_date),
+                'expiration_date': _whois_date(w.expiration_date),
                 'name_servers': w.name_servers,
                 'status': w.status,
                 'emails': emails,
@@ -100,99 +160,104 @@ class OSINTModule:
         except Exception as e:
             return {'error': str(e)}
     
+    @cached_probe('dns')
     def dns_enumeration(self, domain):
-        dns_records = {}
-        record_types = ['A', 'AAAA', 'MX', 'NS', 'TXT', 'SOA', 'CNAME']
-        
-        for record_type in record_types:
-            try:
-                answers = dns.resolver.resolve(domain, record_type)
-                dns_records[record_type] = [str(rdata) for rdata in answers]
-            except Exception:
-                dns_records[record_type] = []
-        
-        return dns_records
+        # All record types are queried at once through the pipelined engine
+        return self._dns_records(self.resolver.resolve_many(self._dns_queries(domain)))
+    
+    @staticmethod
+    def _dns_queries(domain):
+        return [(domain, record_type) for record_type in ('A', 'AAAA', 'MX', 'NS', 'TXT', 'SOA', 'CNAME')]
+    
+    @staticmethod
+    def _dns_records(answers):
+        return {record_type: [str(rdata) for rdata in rdatas] for (_, record_type), (rdatas, _) in answers.items()}
     
     def detect_dnssec(self, domain):
-        status = {'dnskey': False, 'ds': False}
-        try:
-            answers = dns.resolver.resolve(domain, 'DNSKEY')
-            status['dnskey'] = len(list(answers)) > 0
-        except Exception:
-            pass
-        try:
-            answers = dns.resolver.resolve(domain, 'DS')
-            status['ds'] = len(list(answers)) > 0
-        except Exception:
-            pass
+        return self._dnssec_status(domain, self.resolver.resolve_many([(domain, 'DNSKEY'), (domain, 'DS')]))
+    
+    @staticmethod
+    def _dnssec_status(domain, answers):
+        status = {
+            'dnskey': len(answers[(domain, 'DNSKEY')][0]) > 0,
+            'ds': len(answers[(domain, 'DS')][0]) > 0
+        }
         status['enabled'] = status['dnskey'] and status['ds']
         return status
     
     def find_subdomains(self, domain):
-        subdomains = []
-        common_subdomains = [
-            'www', 'mail', 'ftp', 'localhost', 'webmail', 'smtp',
-            'pop', 'ns1', 'webdisk', 'ns2', 'cpanel', 'whm',
-            'autodiscover', 'autoconfig', 'm', 'imap', 'test',
-            'ns', 'blog', 'pop3', 'dev', 'www2', 'admin',
-            'portal', 'ns3', 'dns1', 'api', 'cdn', 'vpn'
-        ]
-        
-        for sub in common_subdomains:
-            try:
-                full_domain = f"{sub}.{domain}"
-                socket.gethostbyname(full_domain)
-                subdomains.append(full_domain)
-            except socket.gaierror:
-                pass
-        
-        return subdomains
+        enumerator, labels = self._subdomain_enumerator()
+        return sorted(found['name'] for found in enumerator.iter_subdomains(domain, labels))
+    
+    def _subdomain_enumerator(self):
+        wordlist = self.config.get('subdomain_wordlist')
+        labels = iter_wordlist(wordlist) if wordlist else self.COMMON_SUBDOMAINS
+        enumerator = SubdomainEnumerator(self.resolver, rate=self.config.get('subdomain_rate', 0),
+                                         progress=bool(wordlist))
+        return enumerator, labels
     
+    @cached_probe('ip_info')
     def get_ip_info(self, target):
         try:
-            ip = socket.gethostbyname(target)
+            ip = self.resolver.gethostbyname(target)
             try:
-                hostname = socket.gethostbyaddr(ip)[0]
+                hostname = self.resolver.gethostbyaddr(ip)[0]
             except Exception:
                 hostname = None
             
-            try:
-                response = self._http_get(f'https://ipapi.co/{ip}/json/', timeout=5)
-                geo_data = response.json()
-            except Exception:
-                geo_data = {}
+            if self.geoip is not None:
+                geo_data = self.geoip.lookup(ip) or {}
+            else:
+                try:
+                    response = self._http_get(self._geolocation_url(ip), timeout=5)
+                    geo_data = response.json()
+                except Exception:
+                    geo_data = {}
             
-            return {
-                'ip_address': ip,
-                'hostname': hostname,
-                'geolocation': geo_data,
-                'asn': geo_data.get('asn') if isinstance(geo_data, dict) else None
-            }
+            return self._ip_record(ip, hostname, geo_data)
         except Exception as e:
             return {'error': str(e)}
     
+    @staticmethod
+    def _geolocation_url(ip):
+        return f'https://ipapi.co/{ip}/json/'
+    
+    @staticmethod
+    def _ip_record(ip, hostname, geo_data):
+        return {
+            'ip_address': ip,
+            'hostname': hostname,
+            'geolocation': geo_data,
+            'asn': geo_data.get('asn') if isinstance(geo_data, dict) else None
+        }
+    
+    @cached_probe('tls_certificate')
     def get_ssl_info(self, domain):
         try:
-            import ssl
-            import OpenSSL
-            
-            context = ssl.create_default_context()
-            with socket.create_connection((domain, 443), timeout=5) as sock:
-                with context.wrap_socket(sock, server_hostname=domain) as ssock:
-                    cert = ssock.getpeercert()
-                    
-            return {
-                'subject': dict(x[0] for x in cert['subject']),
-                'issuer': dict(x[0] for x in cert['issuer']),
-                'version': cert['version'],
-                'serial_number': cert['serialNumber'],
-                'not_before': cert['notBefore'],
-                'not_after': cert['notAfter'],
-                'san': cert.get('subjectAltName', [])
-            }
+            handshake = self.tls_probe.handshake(domain, 443)
+            return self._summarize_handshake(handshake)
         except Exception as e:
             return {'error': str(e)}
     
+    def _summarize_handshake(self, handshake):
+        info = self._summarize_certificate(handshake['certificate'])
+        info['fingerprint_sha256'] = handshake['fingerprint_sha256']
+        info['verified'] = handshake['verified']
+        info['verify_error'] = handshake['verify_error']
+        info['chain'] = self.tls_probe.chain_summary(handshake)
+        return info
+    
+    def _summarize_certificate(self, cert):
+        return {
+            'subject': dict(x[0] for x in cert['subject']),
+            'issuer': dict(x[0] for x in cert['issuer']),
+            'version': cert['version'],
+            'serial_number': cert['serialNumber'],
+            'not_before': cert['notBefore'],
+            'not_after': cert['notAfter'],
+            'san': cert.get('subjectAltName', [])
+        }
+    
     def get_http_headers(self, target):
         try:
             if not target.startswith('http'):
@@ -289,15 +354,14 @@ class OSINTModule:
         # Basic probe of negotiated protocol/cipher
         info = {'protocol': None, 'cipher': None}
         try:
-            import ssl
             host = target
             if host.startswith('http'):
                 host = host.split('://', 1)[1].split('/', 1)[0]
-            context = ssl.create_default_context()
-            with socket.create_connection((host, 443), timeout=5) as sock:
-                with context.wrap_socket(sock, server_hostname=host) as ssock:
-                    info['protocol'] = ssock.version()
-                    info['cipher'] = ssock.cipher()[0] if ssock.cipher() else None
+            handshake = self.tls_probe.handshake(host, 443)
+            info['protocol'] = handshake['protocol']
+            info['cipher'] = handshake['cipher']
+            if self.config.get('tls_matrix'):
+                info['matrix'] = self.tls_probe.enumerate_matrix(host, 443)
         except Exception as e:
             info['error'] = str(e)
         return info
@@ -333,7 +397,7 @@ class OSINTModule:
         # SPF, DKIM (selector-agnostic), DMARC
         result = {'spf': None, 'dmarc': None, 'dkim': None}
         try:
-            txt = dns.resolver.resolve(domain, 'TXT')
+            txt = self.resolver.resolve(domain, 'TXT')
             spf = [str(rdata.strings[0].decode()) if hasattr(rdata, 'strings') and rdata.strings else str(rdata) for rdata in txt]
             spf_records = [t for t in spf if 'v=spf1' in t]
             result['spf'] = spf_records[0] if spf_records else None
@@ -341,7 +405,7 @@ class OSINTModule:
             result['spf'] = None
         try:
             dmarc_domain = f'_dmarc.{domain}'
-            txt = dns.resolver.resolve(dmarc_domain, 'TXT')
+            txt = self.resolver.resolve(dmarc_domain, 'TXT')
             dmarc = [str(rdata.strings[0].decode()) if hasattr(rdata, 'strings') and rdata.strings else str(rdata) for rdata in txt]
             dmarc_records = [t for t in dmarc if 'v=DMARC1' in t]
             dmarc_policy = None
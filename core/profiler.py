@@ -181,7 +181,7 @@ class DataProfiler:
         if 'osint' in data:
             osint_data = data['osint']
             whois_data = osint_data.get('whois', {})
-            if 'creation_date' in whois_data:
+            if whois_data.get('creation_date'):
                 timeline.append({
                     'date': whois_data['creation_date'],
                     'event': 'Domain registered',
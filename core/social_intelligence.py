@@ -2,14 +2,17 @@
 Social Intelligence Module - Social media reconnaissance
 """
 
-import requests
 from datetime import datetime
 import json
 import re
 
+from utils.http_client import get_session
+from utils.rate_limiter import get_rate_limiter
+
 class SocialIntelligence:
     def __init__(self, config):
         self.config = config
+        self.rate_limiter = get_rate_limiter(config)
         self.platforms = [
             'github', 'twitter', 'instagram', 'facebook', 'linkedin',
             'reddit', 'pinterest', 'youtube', 'tiktok',
@@ -23,7 +26,8 @@ class SocialIntelligence:
     def _http_get(self, url, timeout=5):
         headers = {'User-Agent': self.config.get('user_agent')}
         proxies = {'http': self.config.get('proxy'), 'https': self.config.get('proxy')} if self.config.get('proxy') else None
-        return requests.get(url, timeout=timeout, headers=headers, proxies=proxies)
+        self.rate_limiter.acquire(url)
+        return get_session(self.config).get(url, timeout=timeout, headers=headers, proxies=proxies)
         
     def search_username(self, username):
         results = {
@@ -211,7 +211,7 @@ class DoxingModule:
         
         if 'osint' in data:
             whois_data = data['osint'].get('whois', {})
-            if 'creation_date' in whois_data:
+            if whois_data.get('creation_date'):
                 events.append({
                     'date': whois_data['creation_date'],
                     'event': 'Domain registered',
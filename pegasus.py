@@ -5,8 +5,10 @@ Main entry point for the application
 """
 
 import argparse
+import os
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from pathlib import Path
 
@@ -18,9 +20,10 @@ from core.email_intelligence import EmailIntelligence
 from core.phone_intelligence import PhoneIntelligence
 from core.profiler import DataProfiler
 from core.report_generator import ReportGenerator
-from utils.logger import setup_logger
+from utils.logger import log_to_stderr, setup_logger
 from utils.banner import print_banner
-from utils.validator import validate_inputs
+from utils.validator import validate_inputs, validate_ip
+from utils.result_sink import NDJSONSink
 
 logger = setup_logger()
 
@@ -29,6 +32,7 @@ class PegasusOSINT:
         self.config = self.load_config()
         self._apply_safe_defaults()
         self.results = {'audit_id': self._generate_audit_id()}
+        self.sink = None
         
     def _generate_audit_id(self):
         from hashlib import sha256
@@ -39,12 +43,14 @@ class PegasusOSINT:
         self.config.setdefault('deep_scan', False)
         self.config.setdefault('rate_limit', 0)
         self.config.setdefault('concurrency', 1)
+        self.config.setdefault('probe_timeout', 60)
         self.config.setdefault('retries', 2)
         self.config.setdefault('backoff_factor', 0.5)
         self.config.setdefault('report', {'theme': 'light', 'include_sections': [], 'txt_minimal': False})
         self.config.setdefault('intrusive_checks', False)
         self.config.setdefault('proxy', None)
         self.config.setdefault('audit', {'enabled': True})
+        self.config.setdefault('ndjson_flush_interval', 1.0)
         
     def load_config(self):
         config_file = Path('config.json')
@@ -64,54 +70,138 @@ class PegasusOSINT:
             'deep_scan': False,
             'rate_limit': 0,
             'concurrency': 1,
+            'probe_timeout': 60,
             'retries': 2,
             'backoff_factor': 0.5,
             'report': {'theme': 'light', 'include_sections': [], 'txt_minimal': False},
             'intrusive_checks': False,
             'proxy': None,
-            'audit': {'enabled': True}
+            'audit': {'enabled': True},
+            'ndjson_flush_interval': 1.0,
+            'cache_enabled': True,
+            'cache_expiry': 3600
         }
     
+    def open_sink(self, path):
+        self.sink = NDJSONSink(path, flush_interval=self.config.get('ndjson_flush_interval', 1.0))
+        return self.sink
+    
+    def close_sink(self):
+        if self.sink:
+            self.sink.close()
+            self.sink = None
+    
+    def _make_record(self, module, target, result=None, error=None):
+        record = {
+            'audit_id': self.results['audit_id'],
+            'target': target,
+            'module': module,
+            'timestamp': datetime.now().isoformat()
+        }
+        if error is not None:
+            record['error'] = error
+        else:
+            record['result'] = result
+        return record
+    
+    def _emit(self, module, target, result):
+        if self.sink:
+            self.sink.write(self._make_record(module, target, result))
+    
     def run_osint_scan(self, target):
         logger.info(f"Running OSINT scan on: {target}")
         osint = OSINTModule(self.config)
         self.results['osint'] = osint.scan(target)
+        self._emit('osint', target, self.results['osint'])
         return self.results['osint']
     
     def run_social_intelligence(self, username):
         logger.info(f"Running social intelligence on username: {username}")
         social = SocialIntelligence(self.config)
         self.results['social'] = social.search_username(username)
+        self._emit('social', username, self.results['social'])
         return self.results['social']
     
     def run_network_intelligence(self, target_ip, scan_ports=False):
         logger.info(f"Running network intelligence on: {target_ip}")
         network = NetworkIntelligence(self.config)
         self.results['network'] = network.scan(target_ip, scan_ports)
+        self._emit('network', target_ip, self.results['network'])
         return self.results['network']
     
+    def run_metadata_directory(self, directory):
+        logger.info(f"Extracting metadata from directory: {directory}")
+        extractor = MetadataExtractor(self.config)
+        for result in extractor.iter_extract_all(directory):
+            yield self._make_record('metadata', result.get('file_path'), result)
+    
     def run_metadata_extraction(self, file_path):
         logger.info(f"Extracting metadata from: {file_path}")
         extractor = MetadataExtractor(self.config)
         self.results['metadata'] = extractor.extract(file_path)
+        self._emit('metadata', file_path, self.results['metadata'])
         return self.results['metadata']
     
     def run_email_intelligence(self, email):
         logger.info(f"Running email intelligence on: {email}")
         email_intel = EmailIntelligence(self.config)
         self.results['email'] = email_intel.investigate(email)
+        self._emit('email', email, self.results['email'])
         return self.results['email']
     
     def run_phone_intelligence(self, phone):
         logger.info(f"Running phone intelligence on: {phone}")
         phone_intel = PhoneIntelligence(self.config)
         self.results['phone'] = phone_intel.lookup(phone)
+        self._emit('phone', phone, self.results['phone'])
         return self.results['phone']
     
+    def scan_target(self, target, scan_ports=False):
+        # Batch entry point: results are returned, not accumulated in self.results
+        module = 'network' if validate_ip(target) else 'osint'
+        try:
+            if module == 'network':
+                result = NetworkIntelligence(self.config).scan(target, scan_ports)
+            else:
+                result = OSINTModule(self.config).scan(target)
+            return self._make_record(module, target, result)
+        except Exception as e:
+            return self._make_record(module, target, error=str(e))
+    
+    def run_batch(self, targets, workers=4, scan_ports=False):
+        logger.info(f"Running batch scan with {workers} worker(s)")
+        workers = max(int(workers or 1), 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for target in targets:
+                pending.add(executor.submit(self.scan_target, target, scan_ports))
+                # Keep the queue short so targets are read only as workers free up
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    
+    def run_network_range(self, cidr, scan_ports=False):
+        logger.info(f"Running network range scan on: {cidr}")
+        network = NetworkIntelligence(self.config)
+        for host in network.scan_network(cidr, scan_ports):
+            yield self._make_record('network_range', host['ip'], host)
+    
+    def run_ptr_sweep(self, cidr):
+        logger.info(f"Running reverse DNS sweep on: {cidr}")
+        network = NetworkIntelligence(self.config)
+        for host in network.iter_reverse_dns(cidr):
+            yield self._make_record('reverse_dns', host['ip'], host)
+    
     def create_profile(self, target_info):
         logger.info("Creating comprehensive profile")
         profiler = DataProfiler(self.config)
         self.results['profile'] = profiler.create_profile(self.results)
+        self._emit('profile', target_info, self.results['profile'])
         return self.results['profile']
     
     def generate_report(self, output_file, format='html'):
@@ -125,6 +215,17 @@ class PegasusOSINT:
         generator = ReportGenerator(self.config)
         return generator.generate(self.results, output_file, format)
 
+def iter_targets(source):
+    handle = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+    try:
+        for line in handle:
+            target = line.strip()
+            if target and not target.startswith('#'):
+                yield target
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
 def parse_arguments():
     parser = argparse.ArgumentParser(
         description='Pegasus Three - OSINT Toolkit',
@@ -135,44 +236,66 @@ Examples:
   python pegasus.py --username johndoe --module social
   python pegasus.py --email test@example.com --module email
   python pegasus.py --target "John Doe" --profile --output report.html
+  python pegasus.py --targets-file domains.txt --workers 8
+  python pegasus.py --cidr 10.0.0.0/24 --scan-ports
+  python pegasus.py --cidr 10.0.0.0/16 --ptr-sweep
         """
     )
     
     parser.add_argument('--domain', help='Target domain for OSINT')
     parser.add_argument('--ip', help='Target IP address')
+    parser.add_argument('--cidr', help='Internal network range to discover and scan, e.g. 10.0.0.0/16')
+    parser.add_argument('--ptr-sweep', action='store_true', help='With --cidr, stream PTR records for the whole range instead of scanning it')
     parser.add_argument('--username', help='Username to search')
     parser.add_argument('--email', help='Email address to investigate')
     parser.add_argument('--phone', help='Phone number to lookup')
-    parser.add_argument('--file', help='File for metadata extraction')
+    parser.add_argument('--file', help='File for metadata extraction, or a directory to extract in parallel')
     parser.add_argument('--target', help='General target identifier')
+    parser.add_argument('--targets-file', help='File of domains/IPs to scan, one per line ("-" for stdin)')
     
     parser.add_argument('--module', choices=['osint', 'social', 'network', 'email', 'phone', 'metadata'],
                        help='Specific module to run')
     parser.add_argument('--profile', action='store_true', help='Create comprehensive profile')
     parser.add_argument('--scan-ports', action='store_true', help='Enable port scanning')
+    parser.add_argument('--ports', help='Ports to scan, e.g. "22,80,8000-8100" or "all" (default: common ports)')
     parser.add_argument('--deep-scan', action='store_true', help='Enable deep scanning')
+    parser.add_argument('--subdomain-wordlist', help='Wordlist file of subdomain labels to resolve')
+    parser.add_argument('--subdomain-rate', type=float, default=0, help='Subdomain queries per second (0 = unlimited)')
     
     parser.add_argument('--output', '-o', help='Output file path')
     parser.add_argument('--format', choices=['html', 'json', 'pdf', 'txt'], default='html',
                        help='Output format')
     parser.add_argument('--output-dir', help='Directory to store outputs')
-    parser.add_argument('--rate-limit', type=float, default=0, help='Requests per second limit (0 = unlimited)')
-    parser.add_argument('--concurrency', type=int, default=1, help='Parallelism level for supported ops')
+    parser.add_argument('--ndjson', help='Stream one JSON record per target and module to this file ("-" for stdout)')
+    parser.add_argument('--rate-limit', type=float, help='Global HTTP requests per second (0 = unlimited; overrides config)')
+    parser.add_argument('--concurrency', type=int, help='Parallelism level for supported ops (overrides config)')
+    parser.add_argument('--workers', type=int, help='Targets scanned in parallel in batch mode (default 4), or worker processes for --cidr and directory --file (default from config)')
+    parser.add_argument('--unordered', action='store_true', help='Emit directory --file results as they finish instead of in crawl order')
+    parser.add_argument('--no-dedup', action='store_true', help='Parse every copy of identical files in directory --file mode')
+    parser.add_argument('--index', help='SQLite index of directory --file results; unchanged files are not re-extracted')
+    parser.add_argument('--probe-timeout', type=float, help='Per-probe timeout in seconds (0 = none; overrides config)')
     parser.add_argument('--retries', type=int, default=2, help='HTTP retry attempts')
     parser.add_argument('--backoff', type=float, default=0.5, help='Exponential backoff factor')
     parser.add_argument('--proxy', help='HTTP/SOCKS proxy URL')
     parser.add_argument('--intrusive-checks', action='store_true', help='Enable potentially intrusive checks')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore the on-disk result cache for this run')
     parser.add_argument('--config', help='Custom config file')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
     
     return parser.parse_args()
 
 def main():
-    print_banner()
-    
     args = parse_arguments()
     
-    if not any([args.domain, args.ip, args.username, args.email, args.phone, args.file, args.target]):
+    # Streamed records own stdout, so everything else goes to stderr
+    streaming = bool(args.targets_file or args.cidr or (args.file and os.path.isdir(args.file)) or args.ndjson == '-')
+    if streaming:
+        log_to_stderr()
+        print_banner(file=sys.stderr)
+    else:
+        print_banner()
+    
+    if not any([args.domain, args.ip, args.username, args.email, args.phone, args.file, args.target, args.targets_file, args.cidr]):
         print("Error: Please specify at least one target parameter")
         print("Use --help for usage information")
         sys.exit(1)
@@ -181,16 +304,60 @@ def main():
     
     # Apply CLI-derived config overrides
     pegasus.config['deep_scan'] = bool(args.deep_scan)
-    pegasus.config['rate_limit'] = args.rate_limit
-    pegasus.config['concurrency'] = args.concurrency
+    if args.rate_limit is not None:
+        pegasus.config['rate_limit'] = args.rate_limit
+    if args.concurrency is not None:
+        pegasus.config['concurrency'] = args.concurrency
+    if args.probe_timeout is not None:
+        pegasus.config['probe_timeout'] = args.probe_timeout or None
     pegasus.config['retries'] = args.retries
     pegasus.config['backoff_factor'] = args.backoff
     pegasus.config['proxy'] = args.proxy
     pegasus.config['intrusive_checks'] = bool(args.intrusive_checks)
+    if args.subdomain_wordlist:
+        pegasus.config['subdomain_wordlist'] = args.subdomain_wordlist
+    if args.subdomain_rate:
+        pegasus.config['subdomain_rate'] = args.subdomain_rate
     if args.output_dir:
         pegasus.config['output_dir'] = args.output_dir
+    if args.ports:
+        pegasus.config['ports'] = args.ports
+    if args.no_cache:
+        pegasus.config['cache_enabled'] = False
+    
+    if args.ndjson:
+        pegasus.open_sink(args.ndjson)
     
     try:
+        metadata_dir = args.file if args.file and os.path.isdir(args.file) else None
+        if args.targets_file or args.cidr or metadata_dir:
+            if metadata_dir:
+                if args.workers:
+                    pegasus.config['metadata_workers'] = args.workers
+                pegasus.config['metadata_ordered'] = not args.unordered
+                if args.index:
+                    pegasus.config['metadata_index'] = args.index
+                if args.no_dedup:
+                    pegasus.config['metadata_dedup'] = False
+                records = pegasus.run_metadata_directory(metadata_dir)
+            elif args.cidr and args.ptr_sweep:
+                records = pegasus.run_ptr_sweep(args.cidr)
+            elif args.cidr:
+                if args.workers:
+                    pegasus.config['range_workers'] = args.workers
+                records = pegasus.run_network_range(args.cidr, args.scan_ports)
+            else:
+                records = pegasus.run_batch(iter_targets(args.targets_file), args.workers or 4, args.scan_ports)
+            count = 0
+            for record in records:
+                if pegasus.sink:
+                    pegasus.sink.write(record)
+                else:
+                    print(json.dumps(record, default=str), flush=True)
+                count += 1
+            logger.info(f"Batch scan completed: {count} target(s)")
+            return
+        
         if args.domain or (args.target and not args.module):
             target = args.domain or args.target
             pegasus.run_osint_scan(target)
@@ -220,7 +387,7 @@ def main():
         
         if args.output or pegasus.config.get('output_dir'):
             pegasus.generate_report(args.output, args.format)
-        else:
+        elif not pegasus.sink:
             print("\n" + "="*60)
             print("RESULTS")
             print("="*60)
@@ -229,13 +396,15 @@ def main():
         logger.info("Scan completed successfully")
         
     except KeyboardInterrupt:
-        print("\n\n[!] Scan interrupted by user")
+        print("\n\n[!] Scan interrupted by user", file=sys.stderr if streaming else None)
         sys.exit(0)
     except Exception as e:
         logger.error(f"Error during execution: {str(e)}")
         if args.verbose:
             raise
         sys.exit(1)
+    finally:
+        pegasus.close_sink()
 
 if __name__ == '__main__':
     main()
@@ -17,6 +17,13 @@ def test_imports():
         print(f"✗ OSINT Module: {e}")
         return False
     
+    try:
+        from core.async_osint import AsyncOSINTModule
+        print("✓ Async OSINT Module")
+    except ImportError as e:
+        print(f"✗ Async OSINT Module: {e}")
+        return False
+    
     try:
         from core.social_intelligence import SocialIntelligence
         print("✓ Social Intelligence Module")
@@ -204,6 +211,770 @@ def test_module_initialization():
     
     return True
 
+def test_task_graph():
+    """Test concurrent probe execution"""
+    print("\nTesting task graph executor...")
+    
+    try:
+        import time
+        from utils.executor import TaskGraph
+        
+        graph = TaskGraph(max_workers=4, timeout=0.5)
+        graph.add('slow', time.sleep, 2)
+        graph.add('first', lambda: 1)
+        graph.add('broken', lambda: 1 / 0)
+        graph.add('after_broken', lambda: 2, depends_on=['broken'])
+        graph.add('after_first', lambda: 3, depends_on=['first'])
+        results = graph.run()
+        
+        assert list(results) == ['slow', 'first', 'broken', 'after_broken', 'after_first']
+        assert 'timed out' in results['slow']['error']
+        assert results['first'] == 1 and results['after_first'] == 3
+        assert 'error' in results['broken'] and 'Skipped' in results['after_broken']['error']
+        print("✓ Ordering, timeouts and dependencies")
+        
+        return True
+    except Exception as e:
+        print(f"✗ Task graph test failed: {e}")
+        return False
+
+def test_hung_task():
+    """Test that a hung task does not delay the tasks queued behind it"""
+    print("\nTesting hung task isolation...")
+    
+    import threading
+    import time
+    from utils.executor import TaskGraph
+    
+    release = threading.Event()
+    graph = TaskGraph(max_workers=1, timeout=0.3)
+    graph.add('hung', release.wait, 5)
+    graph.add('fast', lambda: 1)
+    graph.add('also_fast', lambda: 2)
+    started = time.monotonic()
+    try:
+        results = graph.run()
+    finally:
+        release.set()
+    
+    assert 'timed out' in results['hung']['error']
+    assert results['fast'] == 1 and results['also_fast'] == 2
+    assert time.monotonic() - started < 1.0
+    print("✓ Timed-out task gives up its worker")
+    
+    return True
+
+def test_response_cache():
+    """Test that concurrent callers share one fetch and never one exception"""
+    print("\nTesting response cache...")
+    
+    import threading
+    import time
+    from utils.http_cache import ResponseCache
+    
+    cache = ResponseCache(ttl=60)
+    calls = []
+    
+    def fail():
+        calls.append(1)
+        time.sleep(0.1)
+        raise ConnectionError('refused')
+    
+    errors = []
+    
+    def caller():
+        try:
+            cache.get_or_fetch('dead:443', fail)
+        except ConnectionError as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    caller()
+    
+    assert len(calls) == 1 and len(errors) == 5
+    assert len({id(e) for e in errors}) == 5 and all(str(e) == 'refused' for e in errors)
+    print("✓ One fetch, and each caller gets its own copy of the failure")
+    
+    return True
+
+def _start_fake_dns():
+    """UDP+TCP DNS server on a loopback port, answering by query name."""
+    import socket
+    import threading
+    import dns.message
+    import dns.flags
+    import dns.rcode
+    import dns.rrset
+    
+    def answer(wire, over_tcp):
+        query = dns.message.from_wire(wire)
+        name = query.question[0].name.to_text()
+        response = dns.message.make_response(query)
+        if name == 'slow.test.':
+            return None
+        if name == 'junk.test.':
+            return b'\x00\x01not a dns message'
+        if name == 'nx.test.':
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        elif name == 'soa.test.':
+            response.set_rcode(dns.rcode.NXDOMAIN)
+            response.authority.append(dns.rrset.from_text('test.', 3600, 'IN', 'SOA', 'ns.test. admin.test. 1 3600 600 86400 30'))
+        elif name == 'big.test.' and not over_tcp:
+            response.flags |= dns.flags.TC
+        elif name == 'big.test.':
+            response.answer.append(dns.rrset.from_text(name, 60, 'IN', 'A', '192.0.2.1'))
+        elif name == 'alias.test.':
+            response.answer.append(dns.rrset.from_text(name, 300, 'IN', 'CNAME', 'mid.test.'))
+            response.answer.append(dns.rrset.from_text('mid.test.', 120, 'IN', 'CNAME', 'end.test.'))
+            response.answer.append(dns.rrset.from_text('end.test.', 600, 'IN', 'A', '192.0.2.2'))
+        return response.to_wire()
+    
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.bind(('127.0.0.1', 0))
+    port = udp.getsockname()[1]
+    tcp = socket.create_server(('127.0.0.1', port))
+    
+    def serve_udp():
+        while True:
+            wire, address = udp.recvfrom(65535)
+            reply = answer(wire, False)
+            if reply is not None:
+                udp.sendto(reply, address)
+    
+    def serve_tcp():
+        while True:
+            conn, _ = tcp.accept()
+            with conn:
+                length = int.from_bytes(conn.recv(2), 'big')
+                reply = answer(conn.recv(length), True)
+                conn.sendall(len(reply).to_bytes(2, 'big') + reply)
+    
+    for target in (serve_udp, serve_tcp):
+        threading.Thread(target=target, daemon=True).start()
+    return port
+
+def test_rate_limiter():
+    """Test token-bucket refill, burst and per-host isolation against a fake clock"""
+    print("\nTesting rate limiter...")
+    
+    from unittest import mock
+    from utils import rate_limiter
+    
+    class Clock:
+        now = 100.0
+        slept = []
+        def monotonic(self):
+            return self.now
+        def sleep(self, seconds):
+            self.slept.append(seconds)
+            self.now += seconds
+    
+    clock = Clock()
+    with mock.patch.object(rate_limiter, 'time', clock):
+        bucket = rate_limiter.TokenBucket(2, burst=3)
+        assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+        clock.now += 0.5
+        assert bucket.reserve() == 0.5
+        clock.now += 100
+        assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+        print("✓ Burst then rate tokens a second, refill capped at the burst")
+        
+        bucket = rate_limiter.TokenBucket(4)
+        assert bucket.try_acquire() == 0.0
+        assert bucket.try_acquire() == 0.25 and bucket.try_acquire() == 0.25
+        clock.now += 0.25
+        assert bucket.try_acquire() == 0.0
+        print("✓ try_acquire takes nothing while the bucket is empty")
+        
+        limiter = rate_limiter.RateLimiter(per_host=1, burst=2, hosts={'slow.test': 0.5})
+        assert [limiter.reserve('https://A.test/x') for _ in range(2)] == [0.0, 0.0]
+        assert limiter.reserve('a.test') == 1.0
+        assert limiter.reserve('b.test') == 0.0
+        assert [limiter.reserve('slow.test') for _ in range(3)] == [0.0, 0.0, 2.0]
+        limiter.acquire('http://b.test/')
+        limiter.acquire('b.test')
+        assert clock.slept == [1.0]
+        print("✓ Per-host buckets are independent, with host overrides")
+        
+        limiter = rate_limiter.RateLimiter(requests_per_second=1, per_host=0.25)
+        assert limiter.reserve('a.test') == 0.0
+        assert limiter.reserve('b.test') == 1.0
+        assert limiter.reserve('a.test') == 4.0
+        print("✓ The global bucket spans hosts; the longest wait wins")
+    
+    config = {'rate_limit': {'requests_per_second': 5, 'per_host_requests_per_second': 1, 'burst': 2}}
+    shared = rate_limiter.get_rate_limiter(config)
+    assert rate_limiter.get_rate_limiter(dict(config)) is shared
+    assert rate_limiter.get_rate_limiter({'rate_limit': 5}) is not shared
+    assert not rate_limiter.get_rate_limiter({'rate_limit': {'enabled': False, 'requests_per_second': 5}}).enabled
+    print("✓ One shared limiter per rate_limit setting")
+    
+    return True
+
+def test_dns_engine():
+    """Test the pipelined DNS query engine against a local server"""
+    print("\nTesting DNS query engine...")
+    
+    import dns.exception
+    import dns.resolver
+    from utils.dns_engine import DNSQueryEngine
+    
+    engine = DNSQueryEngine(['127.0.0.1'], timeout=0.3, retries=1, port=_start_fake_dns())
+    queries = [('nx.test', 'A'), ('big.test', 'A'), ('alias.test', 'A'), ('slow.test', 'A'), ('junk.test', 'A')]
+    nx, big, alias, slow, junk = engine.query_many(queries)
+    
+    assert isinstance(nx.error, dns.resolver.NXDOMAIN) and not nx.rdatas
+    print("✓ NXDOMAIN")
+    
+    assert big.error is None and [str(r) for r in big.rdatas] == ['192.0.2.1']
+    print("✓ Truncated answer retried over TCP")
+    
+    assert alias.error is None and [str(r) for r in alias.rdatas] == ['192.0.2.2']
+    assert alias.ttl == 120
+    print("✓ CNAME chain followed with the lowest TTL")
+    
+    assert isinstance(slow.error, dns.exception.Timeout)
+    print("✓ Timeout after retries")
+    
+    assert isinstance(junk.error, dns.exception.Timeout) and not junk.rdatas
+    print("✓ Malformed reply ignored")
+    
+    return True
+
+def test_async_resolver():
+    """Test that the event-loop resolver matches the pipelined one and shares its cache"""
+    print("\nTesting async resolver...")
+    
+    import asyncio
+    from utils.dns_engine import DNSQueryEngine
+    from utils.dns_resolver import CachingResolver
+    from utils.subdomains import SubdomainEnumerator
+    
+    port = _start_fake_dns()
+    
+    def resolver():
+        resolver = CachingResolver()
+        resolver._engine = DNSQueryEngine(['127.0.0.1'], timeout=0.3, retries=1, port=port)
+        return resolver
+    
+    def summary(answers):
+        return {query: ([str(r) for r in rdatas], type(error).__name__) for query, (rdatas, error) in answers.items()}
+    
+    queries = [('nx.test', 'A'), ('big.test', 'A'), ('alias.test', 'A'), ('slow.test', 'A'), ('empty.test', 'A')]
+    threaded = resolver()
+    looped = resolver()
+    expected = summary(threaded.resolve_many(queries))
+    assert summary(asyncio.run(looped.resolve_many_async(queries))) == expected
+    print("✓ Same answers and errors as the pipelined engine")
+    
+    hits = looped.hits
+    assert summary(asyncio.run(looped.resolve_many_async(queries))) == expected
+    assert looped.hits - hits == 4
+    print("✓ Answers and negative results served from the shared cache")
+    
+    streamed = resolver()
+    streamed.max_in_flight = 1
+    streamed._engine.max_in_flight = 4
+    labels = [('slow.test', 'A')] + [('e%d.test' % i, 'A') for i in range(12)]
+    order = [name for name, _, _, _ in streamed.iter_resolve(iter(labels))]
+    assert sorted(order) == sorted(name for name, _ in labels)
+    assert order[-1] == 'slow.test'
+    print("✓ A slow query does not hold back the rest of the stream")
+    
+    async def subdomains():
+        enumerator = SubdomainEnumerator(looped)
+        return sorted([f['name'] async for f in enumerator.iter_subdomains_async('test', ['alias', 'big', 'nx', 'empty'])])
+    
+    assert asyncio.run(subdomains()) == ['alias.test', 'big.test']
+    found = SubdomainEnumerator(threaded).enumerate('test', ['alias', 'big', 'nx', 'empty'])
+    assert sorted(f['name'] for f in found) == ['alias.test', 'big.test']
+    print("✓ Subdomain enumeration on the event loop")
+    
+    return True
+
+def test_dns_cache():
+    """Test the resolver cache's TTLs, negative caching, LRU bound and query timeout"""
+    print("\nTesting DNS cache...")
+    
+    import time
+    import dns.exception
+    import dns.resolver
+    from unittest import mock
+    from utils import dns_resolver
+    from utils.dns_engine import DNSQueryEngine
+    
+    class Clock:
+        def time(self):
+            return self.now
+    
+    port = _start_fake_dns()
+    resolver = dns_resolver.CachingResolver(max_entries=3, negative_ttl=50, nameservers=['127.0.0.1'],
+                                            query_timeout=0.3, retries=1)
+    resolver._engine = DNSQueryEngine(['127.0.0.1'], timeout=0.3, retries=1, port=port)
+    resolver._get_resolver().port = port
+    
+    def nxdomain(name):
+        try:
+            resolver.resolve(name)
+        except dns.resolver.NXDOMAIN:
+            return True
+        return False
+    
+    clock = Clock()
+    clock.now = time.time()
+    with mock.patch.object(dns_resolver, 'time', clock):
+        assert [str(r) for r in resolver.resolve('alias.test')] == ['192.0.2.2']
+        resolver.resolve_many([('big.test', 'A')])
+        clock.now += 59
+        misses = resolver.misses
+        resolver.resolve('alias.test')
+        resolver.resolve_many([('big.test', 'A')])
+        assert resolver.misses == misses
+        clock.now += 2
+        resolver.resolve_many([('big.test', 'A')])
+        resolver.resolve('alias.test')
+        assert resolver.misses == misses + 1
+        clock.now += 60
+        resolver.resolve('alias.test')
+        assert resolver.misses == misses + 2
+        print("✓ Answers kept for the lowest TTL in the chain")
+        
+        resolver.clear()
+        assert nxdomain('nx.test') and nxdomain('soa.test')
+        clock.now += 29
+        misses = resolver.misses
+        assert nxdomain('nx.test') and nxdomain('soa.test')
+        assert resolver.misses == misses
+        clock.now += 2
+        assert nxdomain('soa.test') and resolver.misses == misses + 1
+        clock.now += 20
+        assert nxdomain('nx.test') and resolver.misses == misses + 2
+        print("✓ NXDOMAIN kept for the SOA minimum, else dns_negative_ttl")
+        
+        resolver.clear()
+        for _ in range(2):
+            _, error = resolver.resolve_many([('slow.test', 'A')])[('slow.test', 'A')]
+            assert isinstance(error, dns.exception.Timeout)
+        assert resolver.stats()['entries'] == 0
+        print("✓ Timeouts are not cached")
+        
+        for name in ('alias.test', 'big.test', 'nx.test'):
+            resolver.resolve_many([(name, 'A')])
+        resolver.resolve('alias.test')
+        resolver.resolve_many([('soa.test', 'A')])
+        assert resolver.stats()['entries'] == 3 and resolver.evictions == 1
+        misses = resolver.misses
+        resolver.resolve('alias.test')
+        assert resolver.misses == misses
+        resolver.resolve_many([('big.test', 'A')])
+        assert resolver.misses == misses + 1
+        print("✓ Least recently used entries evicted past dns_cache_size")
+    
+    shared = dns_resolver.get_resolver({'timeout': 30, 'dns_query_timeout': 0.3})
+    assert shared._get_resolver().lifetime == 0.3
+    started = time.time()
+    try:
+        resolver.resolve('slow.test')
+        assert False, 'expected a timeout'
+    except dns.exception.Timeout:
+        pass
+    assert time.time() - started < 1
+    print("✓ Single lookups give up after dns_query_timeout")
+    
+    return True
+
+def test_entropy_profile():
+    """Test entropy profiles against a naive reference"""
+    print("\nTesting entropy profiles...")
+    
+    import math
+    import random
+    from collections import Counter
+    import utils.entropy as entropy
+    
+    def naive(data, window, step):
+        points = []
+        for offset in range(0, len(data) - window + 1, step):
+            counts = Counter(data[offset:offset + window])
+            value = -sum(c / window * math.log2(c / window) for c in counts.values())
+            points.append((offset, round(max(value, 0.0), 4)))
+        return points
+    
+    def chunked(data, window, step, sizes):
+        profile = entropy.EntropyProfile(window, step)
+        position = 0
+        for size in sizes:
+            profile.update(data[position:position + size])
+            position += size
+        profile.update(data[position:])
+        return profile.finish()
+    
+    rng = random.Random(7)
+    # Low-entropy text, random bytes and a constant run, so windows straddle regions
+    data = b'abcabcabd' * 300 + bytes(rng.getrandbits(8) for _ in range(3000)) + b'\0' * 1500
+    cases = [(256, None), (256, 64), (512, 128), (64, 4), (7000, 3500), (len(data) + 1, None)]
+    numpy_module = entropy.np
+    try:
+        for backend in ('numpy', 'python'):
+            if backend == 'python':
+                entropy.np = None
+            elif numpy_module is None:
+                continue
+            for window, step in cases:
+                expected = naive(data, window, step or window)
+                for sizes in ([len(data)], [1, 7, 255, 256, 1000], [window - 1, 3, step or 1]):
+                    points = chunked(data, window, step, sizes)
+                    assert [o for o, _ in points] == [o for o, _ in expected], (backend, window, step, sizes)
+                    assert all(abs(a - b) < 1e-3 for (_, a), (_, b) in zip(points, expected)), (backend, window, step)
+            assert abs(entropy.shannon_entropy(data) - naive(data, len(data), 1)[0][1]) < 1e-3
+            print(f"✓ {backend} profiles match across windows, steps and chunk boundaries")
+    finally:
+        entropy.np = numpy_module
+    
+    return True
+
+def test_extraction_index():
+    """Test incremental re-extraction through the extraction index"""
+    print("\nTesting extraction index...")
+    
+    import tempfile
+    from utils.extraction_index import ExtractionIndex, file_key
+    from core.metadata_extractor import MetadataExtractor
+    
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'note.txt')
+        with open(path, 'w') as f:
+            f.write('first')
+        index = ExtractionIndex(os.path.join(root, 'index.db'))
+        key = file_key(os.stat(path))
+        index.set(path, key, {'file_path': path})
+        index.flush()
+        assert index.get(path, key) == {'file_path': path}
+        print("✓ Hit while unchanged")
+        
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+        assert index.get(path, file_key(os.stat(path))) is None
+        with open(path, 'a') as f:
+            f.write(' and more')
+        assert index.get(path, file_key(os.stat(path))) is None
+        print("✓ Miss after mtime or size change")
+        
+        os.remove(path)
+        assert index.purge_missing(root) == 1 and index.stats()['entries'] == 0
+        index.close()
+        print("✓ Pruned when the file disappears")
+        
+        tree = os.path.join(root, 'tree')
+        os.mkdir(tree)
+        for name in ('a.txt', 'b.txt'):
+            with open(os.path.join(tree, name), 'w') as f:
+                f.write('same')
+        config = {'metadata_workers': 1, 'metadata_index': os.path.join(root, 'tree.db')}
+        
+        def run():
+            results = MetadataExtractor(config).extract_all_metadata(tree)
+            return {os.path.basename(r['file_path']): r for r in results}
+        
+        first = run()
+        original = next(name for name, r in first.items() if 'duplicate_of' not in r)
+        copy = 'a.txt' if original == 'b.txt' else 'b.txt'
+        assert first[copy]['duplicate_of'] == os.path.join(tree, original)
+        assert run()[copy].get('duplicate_of') == os.path.join(tree, original)
+        with open(os.path.join(tree, original), 'w') as f:
+            f.write('changed')
+        changed = run()
+        assert 'duplicate_of' not in changed[copy] and 'metadata' in changed[copy]
+        os.remove(os.path.join(tree, original))
+        assert 'metadata' in run()[copy]
+        print("✓ Copies are re-extracted once their original changes or disappears")
+    
+    return True
+
+def test_geoip_ranges():
+    """Test the compiled range index with nested, IPv6 and v4-mapped lookups"""
+    print("\nTesting GeoIP range index...")
+    
+    import tempfile
+    from utils.geoip import RangeIndex, GeoIPDatabase
+    
+    rows = [
+        'network,start,end,city',
+        '10.0.0.0/8,,,Outer',
+        '10.1.0.0/16,,,Middle',
+        '10.1.2.0/24,,,Inner',
+        '10.3.0.0/16,,,Side',
+        ',192.0.2.10,192.0.2.20,Span',
+        '2001:db8::/32,,,Wide',
+        '2001:db8:1::/48,,,Narrow'
+    ]
+    with tempfile.TemporaryDirectory() as root:
+        csv_path = os.path.join(root, 'ranges.csv')
+        with open(csv_path, 'w') as f:
+            f.write('\n'.join(rows) + '\n')
+        
+        index = RangeIndex.from_csv(csv_path)
+        city = lambda ip: (index.lookup(ip) or {}).get('city')
+        expected = {
+            '9.255.255.255': None, '10.0.0.1': 'Outer', '10.1.0.1': 'Middle', '10.1.2.3': 'Inner',
+            '10.1.3.0': 'Middle', '10.2.0.0': 'Outer', '10.3.5.5': 'Side', '10.255.255.255': 'Outer',
+            '11.0.0.0': None, '192.0.2.9': None, '192.0.2.15': 'Span', '192.0.2.21': None
+        }
+        assert {ip: city(ip) for ip in expected} == expected
+        print("✓ Nested IPv4 ranges resolve to the most specific one")
+        
+        assert city('2001:db8::1') == 'Wide'
+        assert city('2001:db8:1::5') == 'Narrow'
+        assert city('2001:db8:2::') == 'Wide'
+        assert city('2001:db9::') is None and city('::1') is None
+        print("✓ IPv6 ranges")
+        
+        assert city('::ffff:10.1.2.3') == 'Inner'
+        assert city('::ffff:10.2.0.0') == 'Outer'
+        print("✓ v4-mapped addresses look up their IPv4 range")
+        index.close()
+        
+        index_path = csv_path + '.idx'
+        built = os.path.getmtime(index_path)
+        RangeIndex.from_csv(csv_path).close()
+        assert os.path.getmtime(index_path) == built
+        with open(csv_path, 'w') as f:
+            f.write('network,city\n10.0.0.0/8,Rebuilt\n')
+        os.utime(csv_path, (built + 10, built + 10))
+        database = GeoIPDatabase([csv_path])
+        assert database.lookup('10.1.2.3') == {'city': 'Rebuilt'}
+        assert database.lookup('2001:db8::1') is None
+        database.close()
+        print("✓ Stale .idx sidecar is rebuilt, fresh one reused")
+        
+        with open(csv_path, 'w') as f:
+            f.write('network,start,end,city\n10.0.0.0/16,,,A\n,10.0.255.0,10.1.0.255,B\n')
+        try:
+            RangeIndex.from_csv(csv_path)
+            assert False, 'expected partially overlapping ranges to be rejected'
+        except ValueError as e:
+            assert 'partially overlap' in str(e)
+        print("✓ Partially overlapping ranges rejected")
+    
+    return True
+
+def test_scan_cache():
+    """Test scan cache expiry, eviction and refusal to store failures"""
+    print("\nTesting scan cache...")
+    
+    import tempfile
+    from unittest import mock
+    from utils import scan_cache
+    
+    class Clock:
+        now = 1000.0
+        def time(self):
+            return self.now
+    
+    clock = Clock()
+    with tempfile.TemporaryDirectory() as root, mock.patch.object(scan_cache, 'time', clock):
+        cache = scan_cache.ScanCache(os.path.join(root, 'cache.sqlite'), expiry=60, max_entries=3)
+        cache.set('dns', 'a.test', {'A': ['192.0.2.1']})
+        clock.now += 59
+        assert cache.get('dns', 'a.test') == {'A': ['192.0.2.1']}
+        clock.now += 2
+        assert cache.get('dns', 'a.test') is None
+        print("✓ Entries expire after cache_expiry")
+        
+        for i, target in enumerate(['b.test', 'c.test', 'd.test', 'e.test']):
+            clock.now += 1
+            cache.set('dns', target, {'A': [f'192.0.2.{i}']})
+        clock.now += 1
+        cache.get('dns', 'b.test')
+        cache.purge()
+        assert cache.stats()['entries'] == 3
+        assert cache.get('dns', 'c.test') is None and cache.get('dns', 'b.test') is not None
+        print("✓ Expired and least recently read entries are evicted")
+        
+        calls = []
+        failures = [
+            {'error': 'timed out'},
+            {'domain_name': None, 'registrar': None, 'creation_date': None, 'name_servers': [], 'org': ''},
+            {'records': {'A': [], 'MX': []}, 'sources': [None]},
+            []
+        ]
+        for value in failures:
+            assert cache.get_or_compute('whois', 'f.test', lambda: calls.append(1) or value) == value
+        assert len(calls) == len(failures) and cache.get('whois', 'f.test') is None
+        print("✓ Errors and empty records are not cached")
+        cache.close()
+        
+        from types import SimpleNamespace
+        from core import osint_module
+        empty = SimpleNamespace(domain_name=None, registrar=None, creation_date=None, expiration_date=None,
+                                name_servers=None, status=None, emails=None, org=None)
+        config = {'cache_enabled': True, 'cache_path': os.path.join(root, 'osint.sqlite')}
+        with mock.patch.object(osint_module.whois, 'whois', return_value=empty) as lookup:
+            module = osint_module.OSINTModule(config)
+            assert 'error' in module.whois_lookup('nowhere.test')
+            assert 'error' in module.whois_lookup('nowhere.test')
+            assert lookup.call_count == 2
+        print("✓ A failed WHOIS lookup is an error, not a cached empty record")
+    
+    return True
+
+def test_stream_stdout():
+    """Test that streaming modes write nothing but JSON lines to stdout"""
+    print("\nTesting streamed stdout...")
+    
+    import json
+    import subprocess
+    import sys
+    import tempfile
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pegasus.py')
+    with tempfile.TemporaryDirectory() as root:
+        tree = os.path.join(root, 'tree')
+        os.mkdir(tree)
+        for name in ('a.txt', 'b.txt', 'c.bin'):
+            with open(os.path.join(tree, name), 'w') as f:
+                f.write(name)
+        output = subprocess.run([sys.executable, script, '--file', tree, '--workers', '1'],
+                                cwd=root, capture_output=True, text=True, timeout=60)
+    
+    assert output.returncode == 0, output.stderr
+    records = [json.loads(line) for line in output.stdout.splitlines()]
+    assert sorted(os.path.basename(r['target']) for r in records) == ['a.txt', 'b.txt', 'c.bin']
+    assert 'Batch scan completed' in output.stderr
+    print("✓ Every stdout line is a JSON record; banner and logs go to stderr")
+    
+    return True
+
+def test_ndjson_sink():
+    """Test NDJSON sink flushing, resuming and streaming to stdout"""
+    print("\nTesting NDJSON sink...")
+    
+    import json
+    import subprocess
+    import sys
+    import tempfile
+    import time
+    from utils.result_sink import NDJSONSink
+    
+    def lines(path):
+        with open(path) as f:
+            return [json.loads(line) for line in f.read().splitlines()]
+    
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'out.ndjson')
+        sink = NDJSONSink(path, flush_interval=0.1)
+        sink.write({'n': 1})
+        assert os.path.getsize(path) == 0
+        time.sleep(0.4)
+        assert lines(path) == [{'n': 1}]
+        sink.close()
+        with NDJSONSink(path, flush_interval=0) as sink:
+            sink.write({'n': 2})
+            assert lines(path) == [{'n': 1}, {'n': 2}]
+        print("✓ Records reach disk within the flush interval, or at once with 0")
+        
+        with open(path, 'a') as f:
+            f.write('{"n": 3, "trunc')
+        with NDJSONSink(path) as sink:
+            sink.write({'n': 4})
+        with open(path) as f:
+            assert f.read().splitlines()[-2:] == ['{"n": 3, "trunc', '{"n":4}']
+        print("✓ Resuming appends after a record cut short by a crash")
+        
+        target = os.path.join(root, 'note.txt')
+        with open(target, 'w') as f:
+            f.write('note')
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pegasus.py')
+        output = subprocess.run([sys.executable, script, '--file', target, '--ndjson', '-'],
+                                cwd=root, capture_output=True, text=True, timeout=60)
+    
+    assert output.returncode == 0, output.stderr
+    records = [json.loads(line) for line in output.stdout.splitlines()]
+    assert [r['target'] for r in records] == [target]
+    print("✓ --ndjson - keeps logs off stdout")
+    
+    return True
+
+def test_port_scanner():
+    """Test port parsing and scan classification on loopback"""
+    print("\nTesting port scanner...")
+    
+    import socket
+    import time
+    from utils.port_scanner import PortScanner, parse_ports
+    
+    assert parse_ports('1-1024,443') == list(range(1, 1025))
+    assert parse_ports(' 22, 80 ,8000-8002,') == [22, 80, 8000, 8001, 8002]
+    assert parse_ports('65530-') == list(range(65530, 65536))
+    assert len(parse_ports('all')) == 65535
+    for bad in ('100-90', '0', '70000', '1-70000', 'http'):
+        try:
+            parse_ports(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f'{bad!r} was accepted')
+    print("✓ Port list parsing")
+    
+    listener = socket.create_server(('127.0.0.1', 0))
+    open_port = listener.getsockname()[1]
+    probe = socket.create_server(('127.0.0.1', 0))
+    closed_port = probe.getsockname()[1]
+    probe.close()
+    # A listener whose accept queue is full drops SYNs, which looks filtered
+    backlog = socket.socket()
+    backlog.bind(('127.0.0.1', 0))
+    backlog.listen(0)
+    filtered_port = backlog.getsockname()[1]
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(('127.0.0.1', filtered_port))
+        fillers.append(filler)
+    time.sleep(0.1)
+    
+    try:
+        scanner = PortScanner(timeout=1.0, min_timeout=0.1, max_timeout=1.0)
+        result = scanner.scan('127.0.0.1', [open_port, closed_port])
+        assert [r.port for r in result['open']] == [open_port]
+        assert [r.port for r in result['closed']] == [closed_port]
+        # Loopback RTTs pull the adaptive timeout down to its floor
+        assert scanner._rtt['127.0.0.1'].timeout == scanner.min_timeout
+        started = time.monotonic()
+        result = scanner.scan('127.0.0.1', [filtered_port])
+        assert [r.port for r in result['filtered']] == [filtered_port]
+        assert time.monotonic() - started < 0.5
+        print("✓ Open, closed and filtered classification with an adaptive timeout")
+    finally:
+        for sock in [listener, backlog] + fillers:
+            sock.close()
+    
+    return True
+
+TESTS = [
+    test_imports,
+    test_configuration,
+    test_validators,
+    test_module_initialization,
+    test_task_graph,
+    test_hung_task,
+    test_response_cache,
+    test_rate_limiter,
+    test_dns_engine,
+    test_async_resolver,
+    test_dns_cache,
+    test_entropy_profile,
+    test_extraction_index,
+    test_geoip_ranges,
+    test_scan_cache,
+    test_stream_stdout,
+    test_ndjson_sink,
+    test_port_scanner
+]
+
 def main():
     print("="*60)
     print("Pegasus Three - Basic Functionality Tests")
@@ -214,25 +985,16 @@ def main():
     tests_failed = 0
     
     # Run tests
-    if test_imports():
-        tests_passed += 1
-    else:
-        tests_failed += 1
-    
-    if test_configuration():
-        tests_passed += 1
-    else:
-        tests_failed += 1
-    
-    if test_validators():
-        tests_passed += 1
-    else:
-        tests_failed += 1
-    
-    if test_module_initialization():
-        tests_passed += 1
-    else:
-        tests_failed += 1
+    for test in TESTS:
+        try:
+            passed = test()
+        except Exception as e:
+            print(f"✗ {test.__name__} failed: {e!r}")
+            passed = False
+        if passed:
+            tests_passed += 1
+        else:
+            tests_failed += 1
     
     # Summary
     print("\n" + "="*60)
@@ -0,0 +1,108 @@
+"""
+Async HTTP client used by the asyncio probe pipeline
+"""
+
+import asyncio
+import json
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from utils.http_client import get_session
+from utils.rate_limiter import get_rate_limiter
+
+class AsyncResponse:
+    """The subset of a response the probes read, independent of backend."""
+
+    def __init__(self, url, status_code, headers, cookies, history, body, encoding=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.cookies = cookies
+        self.history = history
+        self.content = body
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+class AsyncHTTPClient:
+    """Non-blocking GET client backed by aiohttp.
+
+    Without aiohttp installed, requests go through the pooled sync session
+    on a worker thread, so the pipeline still works but scales like threads.
+    """
+
+    def __init__(self, config, executor=None):
+        self.config = config
+        self.executor = executor
+        self.rate_limiter = get_rate_limiter(config)
+        self._session = None
+
+    @property
+    def native(self):
+        return aiohttp is not None
+
+    def _headers(self):
+        return {'User-Agent': self.config.get('user_agent', 'Pegasus-OSINT/1.0')}
+
+    def _proxy(self):
+        proxy = self.config.get('proxy')
+        return proxy if isinstance(proxy, str) and proxy else None
+
+    async def _ensure_session(self):
+        if self._session is None:
+            limit = int(self.config.get('async_max_in_flight') or 1000)
+            connector = aiohttp.TCPConnector(limit=limit, limit_per_host=int(self.config.get('http_pool_size') or 10))
+            self._session = aiohttp.ClientSession(connector=connector, headers=self._headers(),
+                                                  cookie_jar=aiohttp.DummyCookieJar())
+        return self._session
+
+    async def get(self, url, timeout=None, allow_redirects=True):
+        timeout = timeout or int(self.config.get('timeout', 10))
+        await self.rate_limiter.acquire_async(url)
+        if not self.native:
+            return await self._threaded_get(url, timeout, allow_redirects)
+
+        session = await self._ensure_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout),
+                               allow_redirects=allow_redirects, proxy=self._proxy()) as resp:
+            body = await resp.read()
+            return AsyncResponse(
+                url=str(resp.url),
+                status_code=resp.status,
+                headers=dict(resp.headers),
+                cookies={k: v.value for k, v in resp.cookies.items()},
+                history=[str(r.url) for r in resp.history],
+                body=body,
+                encoding=resp.charset
+            )
+
+    async def _threaded_get(self, url, timeout, allow_redirects):
+        proxies = {'http': self._proxy(), 'https': self._proxy()} if self._proxy() else None
+
+        def fetch():
+            return get_session(self.config).get(url, timeout=timeout, allow_redirects=allow_redirects,
+                                                headers=self._headers(), proxies=proxies)
+
+        resp = await asyncio.get_running_loop().run_in_executor(self.executor, fetch)
+        return AsyncResponse(
+            url=resp.url,
+            status_code=resp.status_code,
+            headers=dict(resp.headers),
+            cookies=dict(resp.cookies),
+            history=[r.url for r in resp.history],
+            body=resp.content,
+            encoding=resp.encoding
+        )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
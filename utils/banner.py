@@ -2,7 +2,7 @@
 Banner utility for Pegasus OSINT
 """
 
-def print_banner():
+def print_banner(file=None):
     banner = """
     ╔═══════════════════════════════════════════════════════════════════╗
     ║                                                                   ║
@@ -30,4 +30,4 @@ def print_banner():
     • Comprehensive Reporting
     
     """
-    print(banner)
+    print(banner, file=file)
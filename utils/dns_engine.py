@@ -0,0 +1,426 @@
+"""
+Pipelined DNS query engine
+"""
+
+import asyncio
+import ipaddress
+import random
+import selectors
+import socket
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.exception
+import dns.flags
+import dns.inet
+import dns.message
+import dns.name
+import dns.query
+import dns.rcode
+import dns.rdatatype
+import dns.resolver
+
+class DNSResult:
+    """Outcome of one (name, rdtype) query.
+
+    `error` holds the exception dns.resolver.resolve would have raised
+    (NXDOMAIN, NoAnswer, Timeout, NoNameservers), or None on success.
+    """
+
+    def __init__(self, name, rdtype, rdatas=None, ttl=0, error=None, response=None):
+        self.name = name
+        self.rdtype = rdtype
+        self.rdatas = rdatas or []
+        self.ttl = ttl
+        self.error = error
+        self.response = response
+
+    def __repr__(self):
+        return f'DNSResult({self.name!r}, {self.rdtype!r}, {len(self.rdatas)} rdata, error={self.error!r})'
+
+class _Pending:
+    __slots__ = ('index', 'name', 'rdtype', 'request', 'attempt', 'deadline', 'nameserver', 'errors')
+
+    TIMEOUT = 'timed out'
+
+    def __init__(self, index, name, rdtype):
+        self.index = index
+        self.name = name
+        self.rdtype = rdtype
+        self.request = None
+        self.attempt = 0
+        self.deadline = 0.0
+        self.nameserver = None
+        self.errors = []
+
+class DNSQueryEngine:
+    """Send many DNS queries concurrently over UDP from a single socket.
+
+    Up to `max_in_flight` queries are outstanding at once; each attempt has
+    its own `timeout` and is retried against the next nameserver up to
+    `retries` times. Truncated UDP answers are re-asked over TCP on a small
+    thread pool so the UDP loop never blocks. Given a `pacer` TokenBucket,
+    every packet sent, retries included, waits for one of its tokens.
+
+    iter_query_async() runs the same protocol on the asyncio event loop:
+    all coroutines on a loop share one UDP socket per address family, read
+    through loop.add_reader, so no thread is held per query.
+    """
+
+    def __init__(self, nameservers=None, timeout=2.0, retries=2, max_in_flight=500, port=53):
+        if not nameservers:
+            try:
+                nameservers = dns.resolver.Resolver().nameservers
+            except Exception:
+                nameservers = []
+        self.nameservers = []
+        for ns in nameservers:
+            try:
+                self.nameservers.append(str(ipaddress.ip_address(str(ns))))
+            except ValueError:
+                # DoH/DoT URLs and hostnames are not supported by this engine
+                continue
+        self.timeout = float(timeout)
+        self.retries = max(int(retries), 0)
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.port = int(port)
+        self._channels = weakref.WeakKeyDictionary()
+
+    def query_many(self, queries, pacer=None):
+        """Resolve (name, rdtype) pairs; returns results in input order."""
+        queries = list(queries)
+        results = [None] * len(queries)
+        for index, result in self._run(enumerate(queries), pacer):
+            results[index] = result
+        return results
+
+    def iter_query(self, queries, pacer=None):
+        """Resolve (name, rdtype) pairs lazily, yielding results as they complete."""
+        for _, result in self._run(enumerate(queries), pacer):
+            yield result
+
+    def _run(self, indexed_queries, pacer=None):
+        if not self.nameservers:
+            for index, (name, rdtype) in indexed_queries:
+                yield index, DNSResult(name, rdtype, error=dns.resolver.NoResolverConfiguration())
+            return
+
+        source = iter(indexed_queries)
+        exhausted = False
+        selector = selectors.DefaultSelector()
+        sockets = {}
+        in_flight = {}
+        retry_queue = deque()
+        tcp_pool = ThreadPoolExecutor(max_workers=8)
+        tcp_jobs = {}
+        paced = 0.0
+        try:
+            while True:
+                paced = 0.0
+                while len(in_flight) + len(tcp_jobs) < self.max_in_flight and (retry_queue or not exhausted):
+                    if pacer is not None:
+                        paced = pacer.try_acquire()
+                        if paced:
+                            break
+                    if retry_queue:
+                        pending = retry_queue.popleft()
+                    else:
+                        try:
+                            index, (name, rdtype) = next(source)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        pending = _Pending(index, name, rdtype)
+                    failure = self._send(pending, sockets, selector, in_flight)
+                    if failure is not None:
+                        yield pending.index, failure
+
+                if not in_flight and not tcp_jobs and exhausted and not retry_queue:
+                    break
+
+                now = time.monotonic()
+                wait = min((p.deadline for p in in_flight.values()), default=now + 0.05) - now
+                if tcp_jobs:
+                    wait = min(wait, 0.05)
+                if paced:
+                    wait = min(wait, paced)
+                for key, _ in selector.select(timeout=max(wait, 0)):
+                    yield from self._receive(key.fileobj, in_flight, retry_queue, tcp_pool, tcp_jobs)
+
+                for future in [f for f in tcp_jobs if f.done()]:
+                    pending = tcp_jobs.pop(future)
+                    try:
+                        result = self._to_result(pending, future.result())
+                    except Exception as e:
+                        pending.errors.append((pending.nameserver, True, self.port, e, None))
+                        result = self._retry_or_fail(pending, retry_queue)
+                    if result is not None:
+                        yield pending.index, result
+
+                now = time.monotonic()
+                for key in [k for k, p in in_flight.items() if p.deadline <= now]:
+                    pending = in_flight.pop(key)
+                    pending.errors.append((pending.nameserver, False, self.port, _Pending.TIMEOUT, None))
+                    result = self._retry_or_fail(pending, retry_queue)
+                    if result is not None:
+                        yield pending.index, result
+        finally:
+            tcp_pool.shutdown(wait=False)
+            selector.close()
+            for sock in sockets.values():
+                sock.close()
+
+    async def iter_query_async(self, queries, pacer=None):
+        """iter_query() as an async generator on the running event loop."""
+        if not self.nameservers:
+            for name, rdtype in queries:
+                yield DNSResult(name, rdtype, error=dns.resolver.NoResolverConfiguration())
+            return
+        loop = asyncio.get_running_loop()
+        channel = self._channels.get(loop)
+        if channel is None:
+            channel = self._channels[loop] = _AsyncChannel(self)
+        running = set()
+        try:
+            for name, rdtype in queries:
+                running.add(asyncio.ensure_future(channel.query(name, rdtype, pacer)))
+                if len(running) >= self.max_in_flight:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+    def _socket_for(self, nameserver, sockets, selector):
+        family = dns.inet.af_for_address(nameserver)
+        sock = sockets.get(family)
+        if sock is None:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            selector.register(sock, selectors.EVENT_READ)
+            sockets[family] = sock
+        return sock
+
+    def _send(self, pending, sockets, selector, in_flight):
+        sent = self._transmit(pending, lambda nameserver: self._socket_for(nameserver, sockets, selector), in_flight)
+        if isinstance(sent, DNSResult):
+            return sent
+        pending.deadline = time.monotonic() + self.timeout
+        in_flight[sent] = pending
+        return None
+
+    def _transmit(self, pending, socket_for, in_flight):
+        # Returns the in-flight key of the attempt sent, or the failure once retries run out
+        while True:
+            pending.nameserver = self.nameservers[pending.attempt % len(self.nameservers)]
+            sock = socket_for(pending.nameserver)
+            request = dns.message.make_query(pending.name, pending.rdtype)
+            # Message ids only need to be unique among queries still in flight
+            while (sock.family, request.id) in in_flight:
+                request.id = random.randint(0, 65535)
+            pending.request = request
+            try:
+                sock.sendto(request.to_wire(), (pending.nameserver, self.port))
+                return sock.family, request.id
+            except OSError as e:
+                pending.errors.append((pending.nameserver, False, self.port, e, None))
+                pending.attempt += 1
+                if pending.attempt > self.retries:
+                    return self._failure(pending)
+
+    def _receive(self, sock, in_flight, retry_queue, tcp_pool, tcp_jobs):
+        finished = []
+        while True:
+            try:
+                wire, (address, *_) = sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return finished
+            except OSError:
+                # ICMP errors surface here on some platforms; timeouts handle them
+                return finished
+            try:
+                response = dns.message.from_wire(wire, ignore_trailing=True)
+            except Exception:
+                continue
+            pending = in_flight.get((sock.family, response.id))
+            if pending is None or str(ipaddress.ip_address(address)) != pending.nameserver \
+                    or not pending.request.is_response(response):
+                continue
+            del in_flight[(sock.family, response.id)]
+
+            if response.flags & dns.flags.TC:
+                future = tcp_pool.submit(dns.query.tcp, pending.request, pending.nameserver,
+                                         timeout=self.timeout, port=self.port)
+                tcp_jobs[future] = pending
+                continue
+
+            result = self._to_result(pending, response, retry_queue)
+            if result is not None:
+                finished.append((pending.index, result))
+
+    def _retry_or_fail(self, pending, retry_queue):
+        pending.attempt += 1
+        if pending.attempt > self.retries:
+            return self._failure(pending)
+        retry_queue.append(pending)
+        return None
+
+    def _failure(self, pending):
+        if all(e[3] == _Pending.TIMEOUT for e in pending.errors):
+            error = dns.exception.Timeout(timeout=self.timeout * len(pending.errors))
+        else:
+            error = dns.resolver.NoNameservers(request=pending.request, errors=pending.errors)
+        return DNSResult(pending.name, pending.rdtype, error=error)
+
+    def _to_result(self, pending, response, retry_queue=None):
+        rcode = response.rcode()
+        qname = dns.name.from_text(pending.name)
+        if rcode == dns.rcode.NXDOMAIN:
+            error = dns.resolver.NXDOMAIN(qnames=[qname], responses={qname: response})
+            return DNSResult(pending.name, pending.rdtype, error=error, response=response)
+        if rcode != dns.rcode.NOERROR:
+            pending.errors.append((pending.nameserver, False, self.port, dns.rcode.to_text(rcode), response))
+            if retry_queue is None:
+                return self._failure(pending)
+            return self._retry_or_fail(pending, retry_queue)
+
+        rdtype = dns.rdatatype.from_text(pending.rdtype) if isinstance(pending.rdtype, str) else pending.rdtype
+        rdatas, ttl = self._follow_chain(response, qname, rdtype)
+        if not rdatas:
+            return DNSResult(pending.name, pending.rdtype, error=dns.resolver.NoAnswer(response=response), response=response)
+        return DNSResult(pending.name, pending.rdtype, rdatas=rdatas, ttl=ttl, response=response)
+
+    @staticmethod
+    def _follow_chain(response, qname, rdtype):
+        ttl = None
+        for _ in range(16):
+            rrsets = {(rrset.name, rrset.rdtype): rrset for rrset in response.answer}
+            rrset = rrsets.get((qname, rdtype))
+            if rrset is not None:
+                ttl = rrset.ttl if ttl is None else min(ttl, rrset.ttl)
+                return list(rrset), ttl
+            cname = rrsets.get((qname, dns.rdatatype.CNAME))
+            if cname is None:
+                break
+            ttl = cname.ttl if ttl is None else min(ttl, cname.ttl)
+            qname = cname[0].target
+        return [], 0
+
+
+class _AsyncChannel:
+    """DNSQueryEngine's protocol on one event loop.
+
+    Every query on the loop is multiplexed over one non-blocking UDP socket
+    per address family, read with loop.add_reader. Sockets are opened on
+    demand and closed again once nothing is in flight.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sockets = {}
+        self.in_flight = {}
+        self.pacers = {}
+        self.slots = asyncio.Semaphore(engine.max_in_flight)
+        self.tcp_pool = None
+
+    async def query(self, name, rdtype, pacer=None):
+        async with self.slots:
+            # The query's future doubles as its index, so answers find their waiter
+            future = asyncio.get_running_loop().create_future()
+            pending = _Pending(future, name, rdtype)
+            self.pacers[pending] = pacer
+            try:
+                await self._send(pending)
+                return await future
+            finally:
+                del self.pacers[pending]
+                self._close_if_idle()
+
+    async def _send(self, pending):
+        if pending.index.done():
+            return
+        pacer = self.pacers.get(pending)
+        while pacer is not None:
+            delay = pacer.try_acquire()
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+        sent = self.engine._transmit(pending, self._socket_for, self.in_flight)
+        if isinstance(sent, DNSResult):
+            self._finish(pending, sent)
+            return
+        self.in_flight[sent] = pending
+        asyncio.get_running_loop().call_later(self.engine.timeout, self._expire, sent, pending, pending.attempt)
+
+    def _socket_for(self, nameserver):
+        family = dns.inet.af_for_address(nameserver)
+        sock = self.sockets.get(family)
+        if sock is None:
+            sock = socket.socket(family, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            asyncio.get_running_loop().add_reader(sock, self._readable, sock)
+            self.sockets[family] = sock
+        return sock
+
+    def _readable(self, sock):
+        if self.tcp_pool is None:
+            self.tcp_pool = ThreadPoolExecutor(max_workers=8)
+        retry_queue = []
+        tcp_jobs = {}
+        for future, result in self.engine._receive(sock, self.in_flight, retry_queue, self.tcp_pool, tcp_jobs):
+            if not future.done():
+                future.set_result(result)
+        self._resend(retry_queue)
+        for job, pending in tcp_jobs.items():
+            asyncio.wrap_future(job).add_done_callback(lambda done, pending=pending: self._tcp_done(done, pending))
+
+    def _tcp_done(self, done, pending):
+        retry_queue = []
+        try:
+            result = self.engine._to_result(pending, done.result())
+        except Exception as e:
+            pending.errors.append((pending.nameserver, True, self.engine.port, e, None))
+            result = self.engine._retry_or_fail(pending, retry_queue)
+        if result is not None:
+            self._finish(pending, result)
+        self._resend(retry_queue)
+
+    def _expire(self, key, pending, attempt):
+        if self.in_flight.get(key) is not pending or pending.attempt != attempt:
+            return
+        del self.in_flight[key]
+        pending.errors.append((pending.nameserver, False, self.engine.port, _Pending.TIMEOUT, None))
+        retry_queue = []
+        result = self.engine._retry_or_fail(pending, retry_queue)
+        if result is not None:
+            self._finish(pending, result)
+        self._resend(retry_queue)
+
+    def _resend(self, retry_queue):
+        for pending in retry_queue:
+            asyncio.ensure_future(self._send(pending))
+
+    @staticmethod
+    def _finish(pending, result):
+        if not pending.index.done():
+            pending.index.set_result(result)
+
+    def _close_if_idle(self):
+        if self.pacers:
+            return
+        loop = asyncio.get_running_loop()
+        for sock in self.sockets.values():
+            loop.remove_reader(sock)
+            sock.close()
+        self.sockets.clear()
+        self.in_flight.clear()
+        if self.tcp_pool is not None:
+            self.tcp_pool.shutdown(wait=False)
+            self.tcp_pool = None
@@ -0,0 +1,308 @@
+"""
+Caching DNS resolver shared by the OSINT and network modules
+"""
+
+import asyncio
+import copy
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+
+import dns.exception
+import dns.rdatatype
+import dns.resolver
+import dns.reversename
+
+from utils.dns_engine import DNSQueryEngine
+from utils.rate_limiter import TokenBucket
+from utils.registry import Registry
+
+_resolvers = Registry()
+
+def get_resolver(config):
+    """Return the process-wide caching resolver for this configuration."""
+    key = (
+        int(config.get('dns_cache_size') or 10000),
+        float(config.get('dns_negative_ttl') or 300),
+        tuple(config.get('dns_nameservers') or ()),
+        float(config.get('dns_query_timeout') or 2.0),
+        int(config.get('dns_retries', 2)),
+        int(config.get('dns_max_in_flight') or 500)
+    )
+    return _resolvers.get(key, lambda: CachingResolver(*key))
+
+class CachingResolver:
+    """DNS resolver with a bounded, TTL-aware LRU cache.
+
+    Positive answers live for their record TTL. NXDOMAIN and empty answers
+    are cached too, for the zone's SOA minimum when the response carries one
+    and `negative_ttl` otherwise. Timeouts and server failures are never
+    cached. Lookups raise the same dnspython exceptions as
+    dns.resolver.resolve, so callers can switch over unchanged.
+
+    resolve_many() and iter_resolve() send all cache misses through a
+    pipelined DNSQueryEngine instead of one blocking query at a time. Their
+    *_async counterparts do the same on the asyncio event loop, sharing
+    this cache.
+    """
+
+    def __init__(self, max_entries=10000, negative_ttl=300, nameservers=None,
+                 query_timeout=2.0, retries=2, max_in_flight=500):
+        self.max_entries = max(int(max_entries), 1)
+        self.negative_ttl = float(negative_ttl)
+        self.nameservers = list(nameservers or [])
+        self.query_timeout = float(query_timeout)
+        self.retries = int(retries)
+        self.max_in_flight = int(max_in_flight)
+        self._engine = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._resolver = None
+
+    def _get_resolver(self):
+        if self._resolver is None:
+            resolver = dns.resolver.Resolver(configure=not self.nameservers)
+            if self.nameservers:
+                resolver.nameservers = self.nameservers
+            resolver.timeout = self.query_timeout
+            resolver.lifetime = self.query_timeout
+            self._resolver = resolver
+        return self._resolver
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = DNSQueryEngine(self.nameservers, timeout=self.query_timeout,
+                                          retries=self.retries, max_in_flight=self.max_in_flight)
+        return self._engine
+
+    @staticmethod
+    def _key(name, rdtype):
+        return (str(name).lower().rstrip('.'), str(rdtype).upper())
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._cache[key]
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def _store(self, key, expires, answer, error):
+        if expires <= time.time():
+            return
+        # Keep a detached copy; every hit gets its own (see _error)
+        error = self._error(error)
+        with self._lock:
+            self._cache[key] = (expires, answer, error)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _error(error):
+        # A fresh instance per raise, so tracebacks don't pile up on a shared one
+        return copy.copy(error) if error is not None else None
+
+    def _negative_expiry(self, error):
+        ttl = self.negative_ttl
+        try:
+            response = error.response() if isinstance(error, dns.resolver.NoAnswer) else None
+            if isinstance(error, dns.resolver.NXDOMAIN):
+                responses = list(error.responses().values())
+                response = responses[0] if responses else None
+            if response is not None:
+                for rrset in response.authority:
+                    if rrset.rdtype == dns.rdatatype.SOA:
+                        ttl = min(rrset.ttl, rrset[0].minimum)
+                        break
+        except Exception:
+            pass
+        return time.time() + ttl
+
+    def resolve(self, name, rdtype='A'):
+        key = self._key(name, rdtype)
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry[2] is not None:
+                raise self._error(entry[2])
+            return list(entry[1])
+
+        try:
+            answer = self._get_resolver().resolve(name, rdtype)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            self._store(key, self._negative_expiry(e), None, e)
+            raise
+        rdatas = tuple(answer)
+        expires = getattr(answer, 'expiration', None) or time.time() + answer.rrset.ttl
+        self._store(key, expires, rdatas, None)
+        return list(rdatas)
+
+    def iter_resolve(self, queries, rate=None):
+        """Resolve (name, rdtype) pairs, yielding (name, rdtype, rdatas, error).
+
+        Queries are consumed lazily; hits are answered from the cache and
+        misses are fed straight into the pipelined engine, at most `rate`
+        packets a second. Results arrive in completion order.
+        """
+        pacer = TokenBucket(rate) if rate else None
+        hits = deque()
+        for result in self.engine.iter_query(self._uncached(queries, hits), pacer):
+            while hits:
+                yield hits.popleft()
+            yield self._remember(result)
+        while hits:
+            yield hits.popleft()
+
+    def resolve_many(self, queries):
+        """Resolve (name, rdtype) pairs; returns {(name, rdtype): (rdatas, error)} in input order."""
+        queries = list(queries)
+        results = {query: None for query in queries}
+        for name, rdtype, rdatas, error in self.iter_resolve(queries):
+            results[(name, rdtype)] = (rdatas, error)
+        return results
+
+    async def iter_resolve_async(self, queries, rate=None):
+        """iter_resolve() as an async generator; misses go out on the event loop."""
+        pacer = TokenBucket(rate) if rate else None
+        hits = deque()
+        async for result in self.engine.iter_query_async(self._uncached(queries, hits), pacer):
+            while hits:
+                yield hits.popleft()
+            yield self._remember(result)
+        while hits:
+            yield hits.popleft()
+
+    async def resolve_many_async(self, queries):
+        """resolve_many() for coroutines."""
+        queries = list(queries)
+        results = {query: None for query in queries}
+        async for name, rdtype, rdatas, error in self.iter_resolve_async(queries):
+            results[(name, rdtype)] = (rdatas, error)
+        return results
+
+    def _uncached(self, queries, hits):
+        # Pass on the queries the cache cannot answer, queueing its answers on hits
+        for name, rdtype in queries:
+            entry = self._lookup(self._key(name, rdtype))
+            if entry is None:
+                yield name, rdtype
+            else:
+                hits.append((name, rdtype, list(entry[1] or []), self._error(entry[2])))
+
+    def _remember(self, result):
+        key = self._key(result.name, result.rdtype)
+        if result.error is None:
+            self._store(key, time.time() + result.ttl, tuple(result.rdatas), None)
+        elif isinstance(result.error, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)):
+            self._store(key, self._negative_expiry(result.error), None, result.error)
+        return result.name, result.rdtype, result.rdatas, result.error
+
+    def _system_lookup(self, key, lookup, *args):
+        # Defer to the OS (hosts file, mDNS) when DNS is unusable or the name
+        # is local, caching its outcome for the negative TTL
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry[2] is not None:
+                raise self._error(entry[2])
+            return entry[1]
+        try:
+            result = lookup(*args)
+        except OSError as e:
+            self._store(key, time.time() + self.negative_ttl, None, e)
+            raise
+        self._store(key, time.time() + self.negative_ttl, result, None)
+        return result
+
+    def gethostbyname(self, name):
+        try:
+            return str(ipaddress.ip_address(name))
+        except ValueError:
+            pass
+        try:
+            return str(self.resolve(name, 'A')[0])
+        except dns.exception.DNSException:
+            # The hosts file, nsswitch and search domains may still know the name
+            pass
+        return self._system_lookup((name.lower(), 'SYSTEM:A'), self._system_address, name)
+
+    async def gethostbyname_async(self, name):
+        try:
+            return str(ipaddress.ip_address(name))
+        except ValueError:
+            pass
+        (rdatas, error), = (await self.resolve_many_async([(name, 'A')])).values()
+        if error is None:
+            return str(rdatas[0])
+        return await self._system_lookup_async((name.lower(), 'SYSTEM:A'), self._system_address, name)
+
+    async def gethostbyaddr_async(self, ip):
+        (rdatas, error), = (await self.resolve_many_async(
+            [(dns.reversename.from_address(str(ip)).to_text(), 'PTR')])).values()
+        if error is None:
+            return str(rdatas[0]).rstrip('.'), [], [str(ip)]
+        if isinstance(error, (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)) and not self._is_local_address(ip):
+            raise socket.herror(1, f'{ip}: {error}')
+        return await self._system_lookup_async((str(ip), 'SYSTEM:PTR'), socket.gethostbyaddr, str(ip))
+
+    async def _system_lookup_async(self, key, lookup, *args):
+        entry = self._lookup(key)
+        if entry is not None:
+            if entry[2] is not None:
+                raise self._error(entry[2])
+            return entry[1]
+        # The OS resolver blocks, so it runs on the loop's default executor
+        return await asyncio.get_running_loop().run_in_executor(None, self._system_lookup, key, lookup, *args)
+
+    @staticmethod
+    def _system_address(name):
+        return socket.getaddrinfo(name, None, socket.AF_INET, socket.SOCK_STREAM)[0][4][0]
+
+    def gethostbyaddr(self, ip):
+        try:
+            answers = self.resolve(dns.reversename.from_address(str(ip)).to_text(), 'PTR')
+            # Same shape as socket.gethostbyaddr
+            return str(answers[0]).rstrip('.'), [], [str(ip)]
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            if not self._is_local_address(ip):
+                raise socket.herror(1, f'{ip}: {e}')
+        except dns.exception.DNSException:
+            pass
+        return self._system_lookup((str(ip), 'SYSTEM:PTR'), socket.gethostbyaddr, str(ip))
+
+    @staticmethod
+    def _is_local_address(ip):
+        try:
+            ip_obj = ipaddress.ip_address(ip)
+            return ip_obj.is_loopback or ip_obj.is_link_local or ip_obj.is_private
+        except ValueError:
+            return False
+
+    def stats(self):
+        with self._lock:
+            size = len(self._cache)
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': size,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
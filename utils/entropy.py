@@ -0,0 +1,120 @@
+"""
+Byte histograms and Shannon entropy, vectorized with NumPy when available
+"""
+
+import math
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def _entropy(counts, total):
+    if not total:
+        return 0.0
+    return max(-sum((c / total) * math.log2(c / total) for c in counts if c), 0.0)
+
+class ByteHistogram:
+    """Running count of byte values, fed chunk by chunk."""
+
+    def __init__(self):
+        self.total = 0
+        self._counts = np.zeros(256, dtype=np.int64) if np is not None else Counter()
+
+    def update(self, chunk):
+        if np is not None:
+            self._counts += np.bincount(np.frombuffer(memoryview(chunk), dtype=np.uint8), minlength=256)
+        else:
+            self._counts.update(bytes(chunk))
+        self.total += len(chunk)
+
+    @property
+    def counts(self):
+        if np is not None:
+            return self._counts.tolist()
+        return [self._counts.get(i, 0) for i in range(256)]
+
+    def entropy(self):
+        return _entropy(self.counts, self.total)
+
+def shannon_entropy(data):
+    """Entropy in bits per symbol of bytes, or of the characters of a str."""
+    if not data:
+        return 0.0
+    if isinstance(data, str):
+        if not data.isascii():
+            counts = Counter(data)
+            return _entropy(counts.values(), len(data))
+        data = data.encode('ascii')
+    histogram = ByteHistogram()
+    histogram.update(data)
+    return histogram.entropy()
+
+class EntropyProfile:
+    """Entropy of each `window`-byte region, every `step` bytes, over a stream.
+
+    Chunks may be any size; `step` must divide `window`. Packed, compressed
+    and encrypted regions stand out as windows near 8 bits per byte.
+    """
+
+    def __init__(self, window=4096, step=None):
+        self.window = int(window)
+        self.step = int(step or window)
+        if self.step <= 0 or self.window % self.step:
+            raise ValueError('entropy step must be a positive divisor of the window')
+        self._blocks_per_window = self.window // self.step
+        self._pending = b''
+        self._blocks = []
+        self._offset = 0
+        self.points = []
+
+    def update(self, chunk):
+        data = self._pending + bytes(chunk) if self._pending else bytes(chunk)
+        usable = len(data) - len(data) % self.step
+        self._pending = data[usable:]
+        if usable:
+            self._add_blocks(self._block_histograms(data[:usable]))
+
+    def finish(self):
+        """Returns [(offset, entropy)]; a short trailing region is ignored."""
+        return self.points
+
+    def _block_histograms(self, data):
+        if np is not None:
+            values = np.frombuffer(memoryview(data), dtype=np.uint8).reshape(-1, self.step)
+            # One bincount for all blocks: block i's bytes land in bins i*256..i*256+255
+            index = values.astype(np.int64) + (np.arange(values.shape[0], dtype=np.int64) * 256)[:, None]
+            return np.bincount(index.ravel(), minlength=values.shape[0] * 256).reshape(-1, 256)
+        return [Counter(data[i:i + self.step]) for i in range(0, len(data), self.step)]
+
+    def _add_blocks(self, histograms):
+        k = self._blocks_per_window
+        if np is not None:
+            blocks = np.concatenate([np.asarray(self._blocks, dtype=np.int64).reshape(-1, 256), histograms])
+            if len(blocks) >= k:
+                # Window histograms are sums of k consecutive block histograms
+                cumulative = np.concatenate([np.zeros((1, 256), dtype=np.int64), np.cumsum(blocks, axis=0)])
+                windows = cumulative[k:] - cumulative[:-k]
+                p = windows / self.window
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    entropies = -np.nansum(np.where(p > 0, p * np.log2(p), 0.0), axis=1)
+                for i, value in enumerate(entropies.tolist()):
+                    self.points.append((self._offset + i * self.step, round(max(value, 0.0), 4)))
+                self._offset += len(entropies) * self.step
+            self._blocks = blocks[max(len(blocks) - (k - 1), 0):] if k > 1 else blocks[:0]
+            return
+        blocks = self._blocks + list(histograms)
+        for i in range(len(blocks) - k + 1):
+            window = Counter()
+            for block in blocks[i:i + k]:
+                window.update(block)
+            self.points.append((self._offset, round(_entropy(window.values(), self.window), 4)))
+            self._offset += self.step
+        self._blocks = blocks[max(len(blocks) - (k - 1), 0):] if k > 1 else []
+
+def entropy_profile(data, window=4096, step=None):
+    """[(offset, entropy)] for each window of a bytes-like object."""
+    profile = EntropyProfile(window, step)
+    profile.update(data)
+    return profile.finish()
@@ -0,0 +1,104 @@
+"""
+Task graph executor for running independent probes concurrently
+"""
+
+import queue
+import threading
+import time
+
+class TaskGraph:
+    """Run named tasks concurrently, honouring dependencies and timeouts.
+
+    Results are returned in the order tasks were added, regardless of the
+    order in which they complete. Each task runs on its own daemon thread,
+    at most `max_workers` at a time. A task that exceeds its timeout is
+    reported as an error and its thread abandoned: it no longer holds a
+    worker slot, and it does not keep the interpreter alive at exit.
+    """
+
+    def __init__(self, max_workers=1, timeout=None):
+        self.max_workers = max(int(max_workers or 1), 1)
+        self.timeout = timeout
+        self.tasks = {}
+
+    def add(self, name, func, *args, depends_on=None, timeout=None, **kwargs):
+        if name in self.tasks:
+            raise ValueError(f'Duplicate task: {name}')
+        self.tasks[name] = {
+            'func': func,
+            'args': args,
+            'kwargs': kwargs,
+            'depends_on': list(depends_on or []),
+            'timeout': timeout if timeout is not None else self.timeout
+        }
+        return self
+
+    def run(self):
+        for name, task in self.tasks.items():
+            missing = [d for d in task['depends_on'] if d not in self.tasks]
+            if missing:
+                raise ValueError(f'Task {name} depends on unknown task(s): {missing}')
+
+        results = {}
+        failed = set()
+        waiting = list(self.tasks)
+        running = {}
+        finished = queue.Queue()
+
+        def invoke(name, task):
+            try:
+                finished.put((name, task['func'](*task['args'], **task['kwargs']), None))
+            except Exception as e:
+                finished.put((name, None, e))
+
+        while waiting or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in list(waiting):
+                    task = self.tasks[name]
+                    deps = task['depends_on']
+                    if any(d in failed for d in deps):
+                        results[name] = {'error': f'Skipped: dependency failed ({", ".join(d for d in deps if d in failed)})'}
+                        failed.add(name)
+                    elif all(d in results for d in deps) and len(running) < self.max_workers:
+                        running[name] = time.monotonic()
+                        threading.Thread(target=invoke, args=(name, task), name=f'task-{name}', daemon=True).start()
+                    else:
+                        continue
+                    waiting.remove(name)
+                    progressed = True
+
+            if not running:
+                if waiting:
+                    raise ValueError(f'Dependency cycle between tasks: {waiting}')
+                continue
+
+            try:
+                name, value, error = finished.get(timeout=self._poll_interval(running))
+            except queue.Empty:
+                pass
+            else:
+                # Late results from tasks that already timed out are dropped
+                if running.pop(name, None) is not None:
+                    if error is None:
+                        results[name] = value
+                    else:
+                        results[name] = {'error': str(error)}
+                        failed.add(name)
+
+            now = time.monotonic()
+            for name, started in list(running.items()):
+                limit = self.tasks[name]['timeout']
+                if limit and now - started > limit:
+                    del running[name]
+                    results[name] = {'error': f'Probe timed out after {limit}s'}
+                    failed.add(name)
+
+        return {name: results[name] for name in self.tasks}
+
+    def _poll_interval(self, running):
+        now = time.monotonic()
+        remaining = [max(self.tasks[name]['timeout'] - (now - started), 0)
+                     for name, started in running.items() if self.tasks[name]['timeout']]
+        return min(remaining) if remaining else None
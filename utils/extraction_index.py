@@ -0,0 +1,103 @@
+"""
+Persistent index of metadata extraction results for incremental re-scans
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from utils.registry import Registry
+
+_indexes = Registry()
+
+def get_extraction_index(config):
+    """Return the shared index for config['metadata_index'], or None when unset."""
+    path = config.get('metadata_index')
+    if not path:
+        return None
+    return _indexes.get(path, lambda: ExtractionIndex(path))
+
+def file_key(stat_result):
+    """(device, inode, size, mtime_ns): changes whenever the file's content may have."""
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+
+class ExtractionIndex:
+    """SQLite-backed path -> extraction result store.
+
+    A stored result is only returned while the file's (device, inode, size,
+    mtime_ns) still match what they were at extraction time, so replaced,
+    rewritten or touched files are extracted again. Writes are batched
+    into one transaction per BATCH_SIZE results; call flush() when done.
+    """
+
+    BATCH_SIZE = 256
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            ' path TEXT PRIMARY KEY, dev INTEGER NOT NULL, inode INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, result TEXT NOT NULL)'
+        )
+
+    def get(self, path, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT dev, inode, size, mtime_ns, result FROM files WHERE path = ?', (path,)
+            ).fetchone()
+            if row is None or tuple(row[:4]) != tuple(key):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[4])
+
+    def set(self, path, key, result):
+        payload = json.dumps(result, default=str)
+        with self._lock:
+            self._pending.append((path, *key, payload))
+            if len(self._pending) >= self.BATCH_SIZE:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO files (path, dev, inode, size, mtime_ns, result) VALUES (?, ?, ?, ?, ?, ?)',
+                self._pending
+            )
+        self._pending = []
+
+    def purge_missing(self, root=None):
+        """Drop entries whose files no longer exist (under root, if given)."""
+        with self._lock:
+            rows = self._conn.execute('SELECT path FROM files').fetchall()
+            prefix = os.path.join(root, '') if root else None
+            gone = [(p,) for (p,) in rows if (prefix is None or p.startswith(prefix)) and not os.path.exists(p)]
+            self._conn.executemany('DELETE FROM files WHERE path = ?', gone)
+        return len(gone)
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': count}
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
@@ -0,0 +1,252 @@
+"""
+Offline IP geolocation and ASN lookups from local range databases
+"""
+
+import bisect
+import csv
+import ipaddress
+import json
+import mmap
+import os
+import struct
+
+from utils.registry import Registry
+
+_databases = Registry()
+
+def get_geoip(config):
+    """Return the shared database for config['geoip_database'], or None when unset.
+
+    The setting may be one path or a list of them (e.g. a City and an ASN
+    database); their answers are merged.
+    """
+    paths = config.get('geoip_database')
+    if not paths:
+        return None
+    if isinstance(paths, str):
+        paths = [paths]
+    return _databases.get(tuple(paths), lambda: GeoIPDatabase(paths))
+
+def _ip_key(ip):
+    # IPv4 is mapped into ::ffff:0:0/96 so both families share one sorted key space
+    ip = ipaddress.ip_address(ip)
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b'\0' * 10 + b'\xff\xff' + ip.packed)
+    return ip.packed
+
+def compile_ranges(csv_path, index_path):
+    """Build the binary range index for a CSV of prefix ranges.
+
+    The CSV needs a header with either a `network` column (CIDR) or
+    `start`/`end` columns (first and last address); every other column is
+    kept as the range's record. Nested ranges are allowed and the most
+    specific one wins; ranges that only partly overlap are rejected.
+    """
+    entries = []
+    records = {}
+    blob = bytearray()
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if row.get('network'):
+                network = ipaddress.ip_network(row.pop('network').strip(), strict=False)
+                start, end = network[0], network[-1]
+            elif row.get('start') and row.get('end'):
+                start, end = row.pop('start').strip(), row.pop('end').strip()
+            else:
+                raise ValueError(f'{csv_path}: each row needs a network or start and end')
+            row.pop('start', None)
+            row.pop('end', None)
+            record = json.dumps({k: v for k, v in row.items() if k and v not in (None, '')}, sort_keys=True)
+            offset = records.get(record)
+            if offset is None:
+                offset = len(blob)
+                encoded = record.encode('utf-8')
+                blob += struct.pack('<I', len(encoded)) + encoded
+                records[record] = offset
+            start, end = int.from_bytes(_ip_key(start), 'big'), int.from_bytes(_ip_key(end), 'big')
+            if start > end:
+                raise ValueError(f'{csv_path}: range ends before it starts: {row}')
+            entries.append((start, end, offset))
+    entries = [(start.to_bytes(16, 'big'), end.to_bytes(16, 'big'), offset)
+               for start, end, offset in _disjoint_ranges(csv_path, entries)]
+
+    temp_path = f'{index_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(RangeIndex.HEADER.pack(RangeIndex.MAGIC, len(entries)))
+        f.write(b''.join(start for start, _, _ in entries))
+        for _, end, offset in entries:
+            f.write(end + struct.pack('<Q', offset))
+        f.write(blob)
+    os.replace(temp_path, index_path)
+
+def _disjoint_ranges(csv_path, entries):
+    # Sweep the ranges widest-first at each start, keeping the ranges that
+    # contain the current address on a stack; the innermost one owns it
+    segments = []
+    stack = []
+    position = 0
+
+    def emit_until(end):
+        nonlocal position
+        if position <= end:
+            segments.append((position, end, stack[-1][2]))
+            position = end + 1
+
+    for start, end, offset in sorted(entries, key=lambda e: (e[0], -e[1])):
+        while stack and stack[-1][1] < start:
+            emit_until(stack[-1][1])
+            stack.pop()
+        if stack:
+            if end > stack[-1][1]:
+                raise ValueError(f'{csv_path}: ranges {_address(stack[-1][0])}-{_address(stack[-1][1])} '
+                                 f'and {_address(start)}-{_address(end)} partially overlap')
+            emit_until(start - 1)
+        stack.append((start, end, offset))
+        position = start
+    while stack:
+        emit_until(stack[-1][1])
+        stack.pop()
+    return segments
+
+def _address(key):
+    ip = ipaddress.IPv6Address(key)
+    return str(ip.ipv4_mapped or ip)
+
+class _Keys:
+    # Sequence view of the sorted start keys, for bisect
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        offset = RangeIndex.HEADER.size + i * 16
+        return self.buffer[offset:offset + 16]
+
+class RangeIndex:
+    """Memory-mapped, binary-searched table of IP ranges.
+
+    Layout: header, the sorted 16-byte start keys, then (end key, record
+    offset) pairs, then length-prefixed JSON records shared between ranges.
+    Keeping the start keys contiguous means a lookup touches only a few
+    pages, and the OS page cache shares the file between worker processes.
+    """
+
+    MAGIC = b'PGGEOIP1'
+    HEADER = struct.Struct('<8sQ')
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} is not a compiled range index')
+        self._keys = _Keys(self._map, self.count)
+        self._ends = self.HEADER.size + self.count * 16
+        self._records = self._ends + self.count * 24
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        """Open the compiled sidecar of a CSV, (re)building it when stale."""
+        index_path = csv_path + '.idx'
+        try:
+            fresh = os.path.getmtime(index_path) >= os.path.getmtime(csv_path)
+        except OSError:
+            fresh = False
+        if not fresh:
+            compile_ranges(csv_path, index_path)
+        return cls(index_path)
+
+    def lookup(self, ip):
+        key = _ip_key(ip)
+        i = bisect.bisect_right(self._keys, key) - 1
+        if i < 0:
+            return None
+        entry = self._ends + i * 24
+        if self._map[entry:entry + 16] < key:
+            return None
+        offset = self._records + struct.unpack_from('<Q', self._map, entry + 16)[0]
+        length = struct.unpack_from('<I', self._map, offset)[0]
+        return json.loads(self._map[offset + 4:offset + 4 + length])
+
+    def close(self):
+        self._map.close()
+
+class _MaxMindReader:
+    def __init__(self, path):
+        try:
+            import maxminddb
+        except ImportError:
+            raise ImportError('maxminddb is required for .mmdb databases (pip install maxminddb)')
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip):
+        record = self._reader.get(ip)
+        return self._flatten(record) if record else None
+
+    @staticmethod
+    def _flatten(record):
+        # GeoLite2/GeoIP2 City, Country and ASN layouts onto the CSV field names
+        flat = {}
+        names = lambda section: (record.get(section) or {}).get('names', {}).get('en')
+        if names('city'):
+            flat['city'] = names('city')
+        if record.get('country'):
+            flat['country_name'] = names('country')
+            flat['country_code'] = record['country'].get('iso_code')
+        location = record.get('location') or {}
+        if 'latitude' in location:
+            flat['latitude'] = location['latitude']
+            flat['longitude'] = location.get('longitude')
+        if 'autonomous_system_number' in record:
+            flat['asn'] = f"AS{record['autonomous_system_number']}"
+            flat['org'] = record.get('autonomous_system_organization')
+        return flat
+
+    def close(self):
+        self._reader.close()
+
+class GeoIPDatabase:
+    """Look IPs up in one or more local databases (.mmdb or CSV ranges).
+
+    Records use ipapi-style field names where the source allows it: city,
+    country_name, country_code, latitude, longitude, asn and org.
+    """
+
+    def __init__(self, paths):
+        self.readers = []
+        for path in paths:
+            if path.endswith('.mmdb'):
+                self.readers.append(_MaxMindReader(path))
+            elif path.endswith('.idx'):
+                self.readers.append(RangeIndex(path))
+            else:
+                self.readers.append(RangeIndex.from_csv(path))
+
+    def lookup(self, ip):
+        """Merged record for ip, or None when no database covers it."""
+        merged = None
+        for reader in self.readers:
+            record = reader.lookup(ip)
+            if record:
+                merged = {**(merged or {}), **record}
+        return merged
+
+    def lookup_many(self, ips):
+        """Returns {ip: record or None} for every distinct IP, in input order."""
+        results = {}
+        for ip in ips:
+            if ip not in results:
+                try:
+                    results[ip] = self.lookup(ip)
+                except ValueError:
+                    results[ip] = None
+        return results
+
+    def close(self):
+        for reader in self.readers:
+            reader.close()
@@ -0,0 +1,94 @@
+"""
+Request-scoped HTTP response cache shared by concurrent probes
+"""
+
+import copy
+import threading
+import time
+
+class ResponseCache:
+    """Memoize responses by key, letting concurrent callers share one fetch.
+
+    The first caller for a key performs the fetch; callers arriving while it
+    is in flight wait for that result instead of issuing their own request.
+    Failures are cached too, so a dead host is only tried once per scan.
+    With `ttl`, finished entries are refetched once they are that many
+    seconds old; with `max_entries`, the oldest finished entries are dropped
+    past that size.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url, method='GET', allow_redirects=True):
+        return (method.upper(), url, bool(allow_redirects))
+
+    def get_or_fetch(self, key, fetch):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and entry['ready'].is_set() \
+                    and time.monotonic() - entry['created'] > self.ttl:
+                entry = None
+            owner = entry is None
+            if owner:
+                entry = {'ready': threading.Event(), 'response': None, 'error': None, 'created': time.monotonic()}
+                self._entries.pop(key, None)
+                self._entries[key] = entry
+                self.misses += 1
+                if self.max_entries is not None and len(self._entries) > self.max_entries:
+                    self._evict_locked()
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                entry['response'] = fetch()
+            except Exception as e:
+                entry['error'] = e
+            finally:
+                entry['ready'].set()
+        else:
+            entry['ready'].wait()
+
+        if entry['error'] is not None:
+            # A fresh instance per raise, so tracebacks don't pile up on the cached one
+            raise copy.copy(entry['error'])
+        return entry['response']
+
+    def peek(self, key):
+        """The fresh, successful response for key if one is ready; never waits or fetches."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry['ready'].is_set() or entry['error'] is not None \
+                    or (self.ttl is not None and time.monotonic() - entry['created'] > self.ttl):
+                return None
+            self.hits += 1
+            return entry['response']
+
+    def offer(self, key, response):
+        """Store a response fetched elsewhere unless a fresh one is ready or in flight."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not entry['ready'].is_set() or self.ttl is None
+                                      or time.monotonic() - entry['created'] <= self.ttl):
+                return
+            entry = {'ready': threading.Event(), 'response': response, 'error': None, 'created': time.monotonic()}
+            entry['ready'].set()
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            if self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._evict_locked()
+
+    def _evict_locked(self):
+        excess = len(self._entries) - self.max_entries
+        for key in [k for k, e in self._entries.items() if e['ready'].is_set()][:excess]:
+            del self._entries[key]
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
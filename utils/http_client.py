@@ -0,0 +1,42 @@
+"""
+Pooled keep-alive HTTP sessions shared across modules
+"""
+
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.registry import Registry
+
+_sessions = Registry()
+
+def _pool_settings(config):
+    concurrency = int(config.get('concurrency') or 1)
+    pool_size = int(config.get('http_pool_size') or max(concurrency, 10))
+    pool_hosts = int(config.get('http_pool_hosts') or 100)
+    return pool_hosts, pool_size
+
+def get_session(config):
+    """Return the process-wide session for this pool configuration.
+
+    Each session keeps up to `http_pool_hosts` per-host connection pools,
+    each holding up to `http_pool_size` keep-alive connections, so repeated
+    probes against a host reuse established TCP/TLS connections.
+    """
+    key = _pool_settings(config)
+    return _sessions.get(key, lambda: _build_session(*key))
+
+def _build_session(pool_hosts, pool_size):
+    session = requests.Session()
+    # Retries are handled by the callers; the adapter only pools connections
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Probes must not leak cookies into each other's requests
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+def close_sessions():
+    for session in _sessions.pop_all():
+        session.close()
@@ -0,0 +1,235 @@
+"""
+In-process ICMP and TCP latency probing
+"""
+
+import itertools
+import os
+import re
+import selectors
+import socket
+import statistics
+import struct
+import time
+
+from utils.port_scanner import PortScanner
+
+ICMP_ECHO_REQUEST = {socket.AF_INET: 8, socket.AF_INET6: 128}
+ICMP_ECHO_REPLY = {socket.AF_INET: 0, socket.AF_INET6: 129}
+ICMP_PROTO = {socket.AF_INET: socket.IPPROTO_ICMP, socket.AF_INET6: socket.IPPROTO_ICMPV6}
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def parse_ping_time(output):
+    """First RTT in ms from system ping output, or None."""
+    match = re.search(r'time[=<](\d+\.?\d*)', output)
+    return float(match.group(1)) if match else None
+
+def parse_packet_loss(output):
+    """Packet loss percentage from Unix or Windows ping output, or None."""
+    match = re.search(r'(\d+)%\s*packet loss', output) or re.search(r'Lost = \d+ \((\d+)%\)', output)
+    return int(match.group(1)) if match else None
+
+def summarize_samples(samples):
+    """Loss and min/avg/max/mdev (ms) for a list of RTTs in seconds, None meaning lost."""
+    received = [s * 1000 for s in samples if s is not None]
+    summary = {
+        'sent': len(samples),
+        'received': len(received),
+        'packet_loss': round(100 * (len(samples) - len(received)) / len(samples)) if samples else None,
+        'samples': [round(s * 1000, 3) if s is not None else None for s in samples]
+    }
+    if received:
+        summary.update({
+            'min': round(min(received), 3),
+            'avg': round(statistics.fmean(received), 3),
+            'max': round(max(received), 3),
+            'mdev': round(statistics.pstdev(received), 3)
+        })
+    return summary
+
+class LatencyProber:
+    """Measure round-trip times to many hosts at once without spawning ping.
+
+    Each host gets `count` probes, all hosts in parallel, one round at a
+    time; a probe unanswered after `timeout` seconds counts as lost. ICMP
+    echo is used when the process may open an unprivileged ping socket or a
+    raw socket. Otherwise, and in 'auto' mode for hosts that drop ICMP, the
+    TCP connect time to the first of `ports` that answers (SYN/ACK or RST)
+    is measured instead.
+    """
+
+    def __init__(self, count=4, timeout=1.0, ports=(443, 80, 22), method='auto', window=500):
+        self.count = max(int(count), 1)
+        self.timeout = float(timeout)
+        self.ports = list(ports)
+        self.method = method
+        self.window = window
+        self._ident = os.getpid() & 0xffff
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            count=config.get('latency_count', 4),
+            timeout=config.get('latency_timeout', 1.0),
+            ports=config.get('latency_ports') or (443, 80, 22),
+            method=config.get('latency_method', 'auto'),
+            window=config.get('port_scan_window', 500)
+        )
+
+    def probe(self, target):
+        return self.probe_many([target])[target]
+
+    def probe_many(self, targets):
+        """Probe every target; returns {target: result} in input order."""
+        results = {}
+        addresses = {}
+        for target in targets:
+            try:
+                family, _, _, _, sockaddr = socket.getaddrinfo(target, None, proto=socket.IPPROTO_TCP)[0]
+                addresses[target] = (family, sockaddr[0])
+            except (OSError, UnicodeError) as e:
+                results[target] = {'target': target, 'success': False, 'error': str(e)}
+
+        pending = dict(addresses)
+        if self.method in ('auto', 'icmp'):
+            samples, error = self._icmp_rounds(set(pending.values()))
+            if error is None:
+                for target, address in list(pending.items()):
+                    if any(s is not None for s in samples[address]) or self.method == 'icmp':
+                        results[target] = self._result(target, address[1], 'icmp', samples[address])
+                        del pending[target]
+            elif self.method == 'icmp':
+                for target in pending:
+                    results[target] = {'target': target, 'success': False, 'error': f'ICMP unavailable: {error}'}
+                pending = {}
+
+        if pending:
+            samples, ports = self._tcp_rounds({address[1] for address in pending.values()})
+            for target, address in pending.items():
+                result = self._result(target, address[1], 'tcp', samples[address[1]])
+                result['port'] = ports.get(address[1])
+                results[target] = result
+
+        return {target: results[target] for target in targets}
+
+    @staticmethod
+    def _result(target, ip, method, samples):
+        result = {'target': target, 'ip': ip, 'method': method}
+        result.update(summarize_samples(samples))
+        result['success'] = result['received'] > 0
+        result['response_time'] = result.get('avg')
+        return result
+
+    def _open_icmp(self, family):
+        # Unprivileged ping sockets first (Linux net.ipv4.ping_group_range), then raw
+        try:
+            return socket.socket(family, socket.SOCK_DGRAM, ICMP_PROTO[family]), False
+        except OSError:
+            return socket.socket(family, socket.SOCK_RAW, ICMP_PROTO[family]), True
+
+    def _icmp_rounds(self, addresses):
+        samples = {address: [] for address in addresses}
+        sockets = {}
+        selector = selectors.DefaultSelector()
+        try:
+            for family in {family for family, _ in addresses}:
+                try:
+                    sock, raw = self._open_icmp(family)
+                except OSError as e:
+                    return samples, e
+                sock.setblocking(False)
+                sockets[family] = (sock, raw)
+                selector.register(sock, selectors.EVENT_READ, family)
+
+            for _ in range(self.count):
+                in_flight = {}
+                for family, ip in addresses:
+                    sock, _ = sockets[family]
+                    sequence = next(self._sequence) & 0xffff
+                    try:
+                        sock.sendto(self._echo_request(family, sequence), (ip, 0))
+                    except OSError:
+                        samples[(family, ip)].append(None)
+                        continue
+                    in_flight[(family, sequence)] = ((family, ip), time.monotonic())
+
+                deadline = time.monotonic() + self.timeout
+                while in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    for key, _ in selector.select(timeout=remaining):
+                        sock, raw = sockets[key.data]
+                        for ip, sequence in self._read_replies(sock, key.data, raw):
+                            entry = in_flight.get((key.data, sequence))
+                            if entry is not None and entry[0][1] == ip:
+                                del in_flight[(key.data, sequence)]
+                                samples[entry[0]].append(time.monotonic() - entry[1])
+                for address, _ in in_flight.values():
+                    samples[address].append(None)
+        finally:
+            selector.close()
+            for sock, _ in sockets.values():
+                sock.close()
+        return samples, None
+
+    def _echo_request(self, family, sequence):
+        header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST[family], 0, 0, self._ident, sequence)
+        payload = struct.pack('!d', time.time())
+        if family == socket.AF_INET:
+            header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST[family], 0,
+                                 _checksum(header + payload), self._ident, sequence)
+        # The kernel fills in the ICMPv6 checksum
+        return header + payload
+
+    def _read_replies(self, sock, family, raw):
+        while True:
+            try:
+                packet, address = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            if raw and family == socket.AF_INET:
+                packet = packet[(packet[0] & 0x0f) * 4:]
+            if len(packet) < 8:
+                continue
+            kind, _, _, ident, sequence = struct.unpack('!BBHHH', packet[:8])
+            # Ping sockets rewrite the identifier; raw sockets see every reply
+            if kind != ICMP_ECHO_REPLY[family] or (raw and ident != self._ident):
+                continue
+            yield address[0], sequence
+
+    def _tcp_rounds(self, hosts):
+        # A fixed timeout keeps a slow probe from being mistaken for loss
+        scanner = PortScanner(window=self.window, timeout=self.timeout,
+                              min_timeout=self.timeout, max_timeout=self.timeout)
+        samples = {host: [] for host in hosts}
+        ports = {}
+
+        # First round: every candidate port, keeping the fastest one that answers
+        for result in scanner.iter_scan((host, port) for host in hosts for port in self.ports):
+            if result.state == 'filtered':
+                continue
+            best = ports.get(result.host)
+            if best is None or result.rtt < best[1]:
+                ports[result.host] = (result.port, result.rtt)
+        for host in hosts:
+            samples[host].append(ports[host][1] if host in ports else None)
+        ports = {host: port for host, (port, _) in ports.items()}
+
+        for _ in range(self.count - 1):
+            answered = {}
+            for result in scanner.iter_scan((host, port) for host, port in ports.items()):
+                if result.state != 'filtered':
+                    answered[result.host] = result.rtt
+            for host in hosts:
+                samples[host].append(answered.get(host))
+        return samples, ports
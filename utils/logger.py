@@ -43,3 +43,9 @@ def setup_logger(name='pegasus', level=logging.INFO, log_file=None):
         logger.addHandler(file_handler)
     
     return logger
+
+def log_to_stderr(name='pegasus'):
+    """Move the console handler to stderr, leaving stdout to a result stream."""
+    for handler in logging.getLogger(name).handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
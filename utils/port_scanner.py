@@ -0,0 +1,278 @@
+"""
+Non-blocking TCP connect scanner
+"""
+
+import errno
+import os
+import selectors
+import socket
+import time
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ALL_PORTS = range(1, 65536)
+
+def parse_ports(spec):
+    """Turn '22,80,8000-8100', 'all' or an iterable of ints into a sorted port list."""
+    if spec is None:
+        return []
+    if not isinstance(spec, str):
+        return sorted({int(p) for p in spec})
+    spec = spec.strip().lower()
+    if spec in ('all', '-', '*'):
+        return list(ALL_PORTS)
+    ports = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            start, end = int(start or 1), int(end or 65535)
+            if start > end:
+                raise ValueError(f'Invalid port range: {part}')
+            ports.update(range(start, end + 1))
+        else:
+            ports.add(int(part))
+    invalid = [p for p in ports if not 0 < p < 65536]
+    if invalid:
+        raise ValueError(f'Invalid port(s): {sorted(invalid)[:5]}')
+    return sorted(ports)
+
+class PortResult:
+    __slots__ = ('host', 'port', 'state', 'rtt', 'sock')
+
+    def __init__(self, host, port, state, rtt=None, sock=None):
+        self.host = host
+        self.port = port
+        self.state = state
+        self.rtt = rtt
+        self.sock = sock
+
+    def to_dict(self):
+        return {'host': self.host, 'port': self.port, 'state': self.state,
+                'rtt_ms': round(self.rtt * 1000, 2) if self.rtt is not None else None}
+
+    def __repr__(self):
+        return f'PortResult({self.host!r}, {self.port}, {self.state!r})'
+
+class _RttEstimator:
+    # Retransmission-timeout style estimate (RFC 6298) per host
+    def __init__(self, initial, minimum, maximum):
+        self.srtt = None
+        self.rttvar = None
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def update(self, sample):
+        if self.srtt is None:
+            self.srtt, self.rttvar = sample, sample / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - sample)
+            self.srtt = 0.875 * self.srtt + 0.125 * sample
+
+    @property
+    def timeout(self):
+        if self.srtt is None:
+            return self.initial
+        return min(max(self.srtt + 4 * self.rttvar, self.minimum), self.maximum)
+
+class PortScanner:
+    """Classify TCP ports as open, closed or filtered with non-blocking connects.
+
+    Up to `window` connection attempts are in flight at once (capped by the
+    process file descriptor limit). Each host's timeout starts at `timeout`
+    and then adapts to the RTTs it observes, staying between `min_timeout`
+    and `max_timeout`. Ports that time out are retried `retries` times
+    before being reported filtered. Running out of local descriptors or
+    buffers shrinks the window instead of being reported as port state.
+    Per-host address and RTT state is kept for the most recent MAX_HOSTS
+    hosts, so sweeps over large ranges run in constant memory.
+    """
+
+    CLOSED_ERRORS = {errno.ECONNREFUSED, errno.ECONNRESET}
+    LOCAL_ERRORS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM, errno.EADDRNOTAVAIL}
+    MAX_HOSTS = 4096
+
+    def __init__(self, window=500, timeout=1.0, min_timeout=0.1, max_timeout=3.0, retries=0):
+        self.fd_budget = self._fd_budget()
+        self.window = min(max(int(window), 1), self.fd_budget)
+        self.timeout = float(timeout)
+        self.min_timeout = float(min_timeout)
+        self.max_timeout = max(float(max_timeout), self.timeout)
+        self.retries = max(int(retries), 0)
+        self._addresses = OrderedDict()
+        self._rtt = OrderedDict()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            window=config.get('port_scan_window', 500),
+            timeout=config.get('port_scan_timeout', 1.0),
+            max_timeout=config.get('port_scan_max_timeout', 3.0),
+            retries=config.get('port_scan_retries', 0)
+        )
+
+    @staticmethod
+    def _fd_budget():
+        # Descriptors the scanner may use, leaving some for the rest of the process
+        if resource is not None:
+            soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+            if soft != resource.RLIM_INFINITY:
+                return max(soft - 64, 2)
+        return 65536
+
+    def scan(self, host, ports, keep_open=False, max_open=None):
+        """Scan one host; returns {'open': [...], 'closed': [...], 'filtered': [...]} of PortResults."""
+        grouped = {'open': [], 'closed': [], 'filtered': []}
+        probes = ((host, port) for port in ports)
+        for result in self.iter_scan(probes, keep_open=keep_open, max_open=max_open):
+            grouped[result.state].append(result)
+        for results in grouped.values():
+            results.sort(key=lambda r: r.port)
+        return grouped
+
+    def iter_scan(self, targets, keep_open=False, max_open=None):
+        """Probe (host, port) pairs lazily, yielding PortResults as they resolve.
+
+        With keep_open, open results carry the connected socket in `sock`
+        and the caller is responsible for closing it. At most `max_open`
+        sockets (and never more than half the descriptor budget) are handed
+        out; later open results come without one.
+        """
+        source = iter(targets)
+        exhausted = False
+        retry = []
+        selector = selectors.DefaultSelector()
+        in_flight = {}
+        window = self.window
+        held = [0]
+        if keep_open:
+            limit = self.fd_budget // 2 if max_open is None else min(max_open, self.fd_budget // 2)
+        else:
+            limit = 0
+        try:
+            while True:
+                while len(in_flight) < min(window, self.fd_budget - held[0]) and (retry or not exhausted):
+                    if retry:
+                        host, port, attempt = retry.pop()
+                    else:
+                        try:
+                            host, port = next(source)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        attempt = 0
+                    try:
+                        result = self._start(host, port, attempt, selector, in_flight)
+                    except OSError:
+                        # Out of descriptors or buffers: retry once in-flight probes free some
+                        if not in_flight:
+                            raise
+                        retry.append((host, port, attempt))
+                        window = len(in_flight)
+                        break
+                    if result is not None:
+                        yield self._finish(result, limit, held)
+
+                if not in_flight:
+                    if exhausted and not retry:
+                        break
+                    continue
+
+                now = time.monotonic()
+                wait = max(min(entry[3] for entry in in_flight.values()) - now, 0)
+                for key, _ in selector.select(timeout=wait):
+                    sock = key.fileobj
+                    host, port, attempt, _, started = in_flight.pop(sock)
+                    selector.unregister(sock)
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    rtt = time.monotonic() - started
+                    yield self._finish(self._classify(host, port, err, rtt, sock), limit, held)
+
+                now = time.monotonic()
+                for sock, (host, port, attempt, deadline, _) in list(in_flight.items()):
+                    if deadline <= now:
+                        del in_flight[sock]
+                        selector.unregister(sock)
+                        sock.close()
+                        if attempt < self.retries:
+                            retry.append((host, port, attempt + 1))
+                        else:
+                            yield PortResult(host, port, 'filtered')
+        finally:
+            for sock in in_flight:
+                sock.close()
+            selector.close()
+
+    def _resolve(self, host):
+        address = self._addresses.get(host)
+        if address is None:
+            family, _, _, _, sockaddr = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)[0]
+            address = (family, sockaddr[0])
+            self._remember(self._addresses, host, address)
+        else:
+            self._addresses.move_to_end(host)
+        return address
+
+    def _estimator(self, host):
+        estimator = self._rtt.get(host)
+        if estimator is None:
+            estimator = _RttEstimator(self.timeout, self.min_timeout, self.max_timeout)
+            self._remember(self._rtt, host, estimator)
+        else:
+            self._rtt.move_to_end(host)
+        return estimator
+
+    def _remember(self, cache, host, value):
+        cache[host] = value
+        if len(cache) > self.MAX_HOSTS:
+            cache.popitem(last=False)
+
+    def _start(self, host, port, attempt, selector, in_flight):
+        """Raises OSError for local resource errors, which say nothing about the port."""
+        try:
+            family, ip = self._resolve(host)
+        except OSError:
+            return PortResult(host, port, 'filtered')
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        started = time.monotonic()
+        err = sock.connect_ex((ip, port))
+        if err in self.LOCAL_ERRORS:
+            sock.close()
+            raise OSError(err, os.strerror(err))
+        if err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            deadline = started + self._estimator(host).timeout
+            in_flight[sock] = (host, port, attempt, deadline, started)
+            selector.register(sock, selectors.EVENT_WRITE)
+            return None
+        return self._classify(host, port, err, time.monotonic() - started, sock)
+
+    def _classify(self, host, port, err, rtt, sock):
+        if err == 0:
+            self._estimator(host).update(rtt)
+            return PortResult(host, port, 'open', rtt, sock)
+        sock.close()
+        if err in self.CLOSED_ERRORS:
+            # A RST is as good an RTT sample as a SYN/ACK
+            self._estimator(host).update(rtt)
+            return PortResult(host, port, 'closed', rtt)
+        return PortResult(host, port, 'filtered')
+
+    @staticmethod
+    def _finish(result, limit, held):
+        if result.sock is None:
+            return result
+        if held[0] >= limit:
+            result.sock.close()
+            result.sock = None
+        else:
+            held[0] += 1
+            result.sock.setblocking(True)
+        return result
@@ -0,0 +1,138 @@
+"""
+Token-bucket rate limiting shared by every outbound HTTP caller
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from utils.registry import Registry
+
+_limiters = Registry()
+
+def normalize_rate_limit(value):
+    """Turn config['rate_limit'] into {'requests_per_second', 'per_host', 'burst', 'hosts'}.
+
+    Accepts a plain number (global requests per second, 0 = unlimited) or
+    the config.json object: {"enabled", "requests_per_second",
+    "per_host_requests_per_second", "burst", "hosts": {host: rps}}.
+    """
+    if not isinstance(value, dict):
+        value = {'requests_per_second': value}
+    if not value.get('enabled', True):
+        return {'requests_per_second': 0.0, 'per_host': 0.0, 'burst': 1.0, 'hosts': {}}
+    return {
+        'requests_per_second': float(value.get('requests_per_second') or 0),
+        'per_host': float(value.get('per_host_requests_per_second') or 0),
+        'burst': float(value.get('burst') or 1),
+        'hosts': {str(h).lower(): float(r) for h, r in (value.get('hosts') or {}).items()}
+    }
+
+def get_rate_limiter(config):
+    """Return the process-wide limiter for config['rate_limit']."""
+    settings = normalize_rate_limit(config.get('rate_limit'))
+    key = (settings['requests_per_second'], settings['per_host'], settings['burst'],
+           tuple(sorted(settings['hosts'].items())))
+    return _limiters.get(key, lambda: RateLimiter(settings['requests_per_second'], settings['per_host'],
+                                                  settings['burst'], settings['hosts']))
+
+class TokenBucket:
+    """Refills `rate` tokens a second up to `burst`.
+
+    reserve() always takes a token and returns how long the caller must
+    wait for it, letting the balance go negative. Callers are thus queued
+    in arrival order and nobody polls.
+    """
+
+    def __init__(self, rate, burst=1.0):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise take nothing and return the seconds until one is."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+class RateLimiter:
+    """A global bucket plus one bucket per host.
+
+    A request waits until both its host's bucket and the global bucket grant
+    it a token. A rate of 0 leaves that level unlimited. Host buckets are
+    kept for the most recent MAX_HOSTS hosts.
+    """
+
+    MAX_HOSTS = 10000
+
+    def __init__(self, requests_per_second=0, per_host=0, burst=1, hosts=None):
+        self.global_bucket = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.per_host = float(per_host)
+        self.burst = burst
+        self.host_rates = dict(hosts or {})
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.global_bucket or self.per_host or self.host_rates)
+
+    @staticmethod
+    def _host(target):
+        if '://' in target:
+            return (urlsplit(target).hostname or '').lower()
+        return target.lower()
+
+    def _host_bucket(self, host):
+        rate = self.host_rates.get(host, self.per_host)
+        if not rate:
+            return None
+        with self._lock:
+            bucket = self._hosts.get(host)
+            if bucket is None:
+                bucket = TokenBucket(rate, self.burst)
+                self._hosts[host] = bucket
+                if len(self._hosts) > self.MAX_HOSTS:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(host)
+            return bucket
+
+    def reserve(self, target):
+        """Take a token for a URL or host; returns the seconds to wait before sending."""
+        if not self.enabled:
+            return 0.0
+        waits = [0.0]
+        bucket = self._host_bucket(self._host(target))
+        if bucket is not None:
+            waits.append(bucket.reserve())
+        if self.global_bucket is not None:
+            waits.append(self.global_bucket.reserve())
+        return max(waits)
+
+    def acquire(self, target):
+        delay = self.reserve(target)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, target):
+        delay = self.reserve(target)
+        if delay:
+            await asyncio.sleep(delay)
@@ -0,0 +1,28 @@
+"""
+Process-wide shared instances keyed by the settings they were built from
+"""
+
+import threading
+
+class Registry:
+    """One instance per key, built on first use and shared by every caller."""
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, create):
+        """Return the instance for key, calling create() to build it if there is none yet."""
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                instance = create()
+                self._instances[key] = instance
+            return instance
+
+    def pop_all(self):
+        """Forget every instance, returning them so the caller can close them."""
+        with self._lock:
+            instances = list(self._instances.values())
+            self._instances.clear()
+            return instances
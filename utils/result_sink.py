@@ -0,0 +1,86 @@
+"""
+Streaming NDJSON result sink
+"""
+
+import json
+import os
+import sys
+import threading
+
+class NDJSONSink:
+    """Append one JSON document per line as results complete.
+
+    Writes are buffered and flushed at least every `flush_interval` seconds
+    by a background thread, so a crash loses at most that window of
+    completed records. An existing file is appended to, after ending any
+    record a crash left half-written. Use `-` as the path to stream to stdout.
+    """
+
+    def __init__(self, path, flush_interval=1.0, fsync=False):
+        self.path = path
+        self.flush_interval = float(flush_interval or 0)
+        self.fsync = fsync
+        self.count = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path == '-':
+            self._handle = sys.stdout
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._handle = open(path, 'a', encoding='utf-8')
+            self._end_partial_line()
+        self._stop = threading.Event()
+        self._flusher = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically, name='ndjson-flush', daemon=True)
+            self._flusher.start()
+
+    def _end_partial_line(self):
+        # A crash mid-write leaves a truncated record; start appending on a fresh line
+        if self._handle.tell() == 0:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                self._handle.write('\n')
+
+    def write(self, record):
+        line = json.dumps(record, default=str, separators=(',', ':'))
+        with self._lock:
+            self._handle.write(line + '\n')
+            self.count += 1
+            self._dirty = True
+            if not self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._dirty:
+            return
+        self._handle.flush()
+        if self.fsync and self._handle is not sys.stdout:
+            os.fsync(self._handle.fileno())
+        self._dirty = False
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        if self._handle is not sys.stdout:
+            self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,148 @@
+"""
+Persistent on-disk cache for slow, rate-limited probe results
+"""
+
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.registry import Registry
+
+_caches = Registry()
+
+def get_scan_cache(config):
+    """Return the shared cache for config['cache_path'], or None when disabled."""
+    if not config.get('cache_enabled'):
+        return None
+    path = config.get('cache_path') or os.path.join('cache', 'scan_cache.sqlite')
+    return _caches.get(path, lambda: ScanCache(path, expiry=config.get('cache_expiry', 3600),
+                                               max_entries=config.get('cache_max_entries', 100000)))
+
+def cached_probe(probe):
+    """Serve a probe method from self.scan_cache when it holds a fresh entry.
+
+    Positional arguments form the cache key. Results carrying an 'error'
+    key or holding only empty values are returned but never stored.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args):
+            cache = getattr(self, 'scan_cache', None)
+            if cache is None:
+                return func(self, *args)
+            return cache.get_or_compute(probe, ':'.join(str(a) for a in args), lambda: func(self, *args))
+        return wrapper
+    return decorator
+
+def _is_cacheable(value):
+    if isinstance(value, dict) and 'error' in value:
+        return False
+    return not _is_empty(value)
+
+def _is_empty(value):
+    if isinstance(value, dict):
+        return all(_is_empty(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return all(_is_empty(v) for v in value)
+    return value is None or value == ''
+
+class ScanCache:
+    """SQLite-backed (probe, target) -> JSON result store.
+
+    Entries older than `expiry` seconds are treated as missing. Every
+    EVICT_EVERY writes, expired entries are deleted and, past `max_entries`,
+    the least recently read ones too. Safe to share between threads and
+    between processes.
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path, expiry=3600, max_entries=100000):
+        self.path = path
+        self.expiry = float(expiry)
+        self.max_entries = int(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' probe TEXT NOT NULL, target TEXT NOT NULL, value TEXT NOT NULL,'
+            ' created REAL NOT NULL, accessed REAL NOT NULL,'
+            ' PRIMARY KEY (probe, target))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def get(self, probe, target):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created FROM entries WHERE probe = ? AND target = ?', (probe, target)
+            ).fetchone()
+            if row is None or now - row[1] > self.expiry:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE entries SET accessed = ? WHERE probe = ? AND target = ?', (now, probe, target))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, probe, target, value):
+        now = time.time()
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (probe, target, value, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                (probe, target, payload, now, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict_locked(now)
+
+    def get_or_compute(self, probe, target, compute):
+        value = self.get(probe, target)
+        if value is not None:
+            return value
+        value = compute()
+        if _is_cacheable(value):
+            self.set(probe, target, value)
+        return value
+
+    async def get_or_compute_async(self, probe, target, compute):
+        """get_or_compute() for a coroutine function `compute`."""
+        value = self.get(probe, target)
+        if value is not None:
+            return value
+        value = await compute()
+        if _is_cacheable(value):
+            self.set(probe, target, value)
+        return value
+
+    def _evict_locked(self, now):
+        self._conn.execute('DELETE FROM entries WHERE created < ?', (now - self.expiry,))
+        count = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def purge(self):
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'entries': count}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
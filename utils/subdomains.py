@@ -0,0 +1,123 @@
+"""
+Subdomain resolution engine with streamed wordlists and wildcard filtering
+"""
+
+import logging
+import random
+import string
+import time
+
+def iter_wordlist(path):
+    """Yield labels from a wordlist file one line at a time."""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            label = line.strip().lower()
+            if label and not label.startswith('#'):
+                yield label
+
+class SubdomainEnumerator:
+    """Resolve candidate labels under a domain through the pipelined resolver.
+
+    Labels are consumed lazily, so wordlists of any size run in constant
+    memory. `rate` caps queries per second (0 = as fast as the resolver's
+    in-flight window allows). Each zone is probed once for wildcard DNS and
+    answers that only point at the wildcard addresses are dropped.
+    """
+
+    WILDCARD_PROBES = 3
+
+    def __init__(self, resolver, rate=0, progress=None, progress_interval=1.0):
+        self.resolver = resolver
+        self.rate = float(rate or 0)
+        self.progress = progress
+        self.progress_interval = float(progress_interval)
+        self._wildcards = {}
+
+    def detect_wildcard(self, domain):
+        domain = domain.lower().rstrip('.')
+        if domain not in self._wildcards:
+            answers = self.resolver.resolve_many(self._wildcard_probes(domain))
+            self._wildcards[domain] = self._wildcard_addresses(answers)
+        return self._wildcards[domain]
+
+    async def detect_wildcard_async(self, domain):
+        domain = domain.lower().rstrip('.')
+        if domain not in self._wildcards:
+            answers = await self.resolver.resolve_many_async(self._wildcard_probes(domain))
+            self._wildcards[domain] = self._wildcard_addresses(answers)
+        return self._wildcards[domain]
+
+    def _wildcard_probes(self, domain):
+        return [(f'{self._random_label()}.{domain}', 'A') for _ in range(self.WILDCARD_PROBES)]
+
+    @staticmethod
+    def _wildcard_addresses(answers):
+        return {str(rdata) for rdatas, _ in answers.values() for rdata in rdatas}
+
+    def iter_subdomains(self, domain, labels):
+        """Yield {'name', 'addresses'} for each label that resolves."""
+        stats = self._start(domain, self.detect_wildcard(domain))
+        queries = ((f'{label}.{domain}', 'A') for label in labels)
+        for name, _, rdatas, error in self.resolver.iter_resolve(queries, rate=self.rate or None):
+            found = self._tally(stats, name, rdatas, error)
+            if found is not None:
+                yield found
+        self._report(stats, time.monotonic(), done=True)
+
+    async def iter_subdomains_async(self, domain, labels):
+        """iter_subdomains() as an async generator, resolving on the event loop."""
+        stats = self._start(domain, await self.detect_wildcard_async(domain))
+        queries = ((f'{label}.{domain}', 'A') for label in labels)
+        async for name, _, rdatas, error in self.resolver.iter_resolve_async(queries, rate=self.rate or None):
+            found = self._tally(stats, name, rdatas, error)
+            if found is not None:
+                yield found
+        self._report(stats, time.monotonic(), done=True)
+
+    @staticmethod
+    def _start(domain, wildcard):
+        started = time.monotonic()
+        return {'domain': domain, 'checked': 0, 'found': 0, 'wildcard_filtered': 0,
+                'wildcard': bool(wildcard), 'addresses': wildcard, 'started': started, 'reported': started}
+
+    def _tally(self, stats, name, rdatas, error):
+        stats['checked'] += 1
+        found = None
+        addresses = sorted({str(rdata) for rdata in rdatas}) if error is None else []
+        wildcard = stats['addresses']
+        if addresses and wildcard and set(addresses) <= wildcard:
+            stats['wildcard_filtered'] += 1
+        elif addresses:
+            stats['found'] += 1
+            found = {'name': name, 'addresses': addresses}
+        now = time.monotonic()
+        if now - stats['reported'] >= self.progress_interval:
+            stats['reported'] = now
+            self._report(stats, now)
+        return found
+
+    def enumerate(self, domain, labels):
+        return list(self.iter_subdomains(domain, labels))
+
+    def _report(self, stats, now, done=False):
+        elapsed = now - stats['started']
+        progress = {
+            'domain': stats['domain'],
+            'checked': stats['checked'],
+            'found': stats['found'],
+            'wildcard_filtered': stats['wildcard_filtered'],
+            'wildcard': stats['wildcard'],
+            'elapsed': round(elapsed, 2),
+            'rate': round(stats['checked'] / elapsed, 1) if elapsed else 0.0,
+            'done': done
+        }
+        if callable(self.progress):
+            self.progress(progress)
+        elif self.progress:
+            logging.getLogger('pegasus').info(
+                f"Subdomains {progress['domain']}: {progress['checked']} checked, "
+                f"{progress['found']} found, {progress['rate']}/s")
+
+    @staticmethod
+    def _random_label():
+        return 'pg-' + ''.join(random.choices(string.ascii_lowercase + string.digits, k=16))
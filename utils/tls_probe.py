@@ -0,0 +1,382 @@
+"""
+Shared TLS handshake probe with certificate chain capture
+"""
+
+import asyncio
+import functools
+import hashlib
+import ipaddress
+import os
+import socket
+import ssl
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.http_cache import ResponseCache
+from utils.registry import Registry
+
+try:
+    from cryptography import x509
+    from cryptography.x509.verification import PolicyBuilder, Store, VerificationError
+except ImportError:
+    x509 = None
+
+_probes = Registry()
+
+def get_tls_probe(config):
+    """Return the process-wide TLS probe for this configuration."""
+    key = (
+        float(config.get('tls_timeout') or 5),
+        int(config.get('tls_workers') or 32),
+        float(config.get('tls_cache_ttl') or 300)
+    )
+    return _probes.get(key, lambda: TLSProbe(*key))
+
+# Oldest first; the protocol each cipher reports is the first version it may be used with
+PROTOCOL_VERSIONS = ('TLSv1', 'TLSv1.1', 'TLSv1.2', 'TLSv1.3')
+_CIPHER_PROTOCOLS = {'SSLv3': 0, 'TLSv1.0': 0, 'TLSv1.2': 2, 'TLSv1.3': 3}
+
+def describe_connection(ssl_object, verify_error=None):
+    """Protocol, cipher, leaf certificate and chain fingerprints of a finished handshake.
+
+    Works on both ssl.SSLSocket and ssl.SSLObject. `verify_error` is the
+    reason the peer failed verification, or None when it passed, whether
+    during the handshake or offline. Returns the handshake record and {fingerprint:
+    certificate} for every certificate seen.
+    """
+    cipher = ssl_object.cipher()
+    leaf_der = ssl_object.getpeercert(binary_form=True)
+    # Unverified handshakes only expose certificate details through the chain
+    leaf = ssl_object.getpeercert() or None
+    certificates = {}
+    chain = []
+    verified_handshake = ssl_object.context.verify_mode != ssl.CERT_NONE
+    method = 'get_verified_chain' if verified_handshake else 'get_unverified_chain'
+    for der, info in _peer_chain(ssl_object, method) or [(leaf_der, leaf)]:
+        fingerprint = hashlib.sha256(der).hexdigest()
+        certificates[fingerprint] = (leaf or info) if der == leaf_der else info
+        chain.append(fingerprint)
+    leaf_fingerprint = hashlib.sha256(leaf_der).hexdigest() if leaf_der else None
+    record = {
+        'protocol': ssl_object.version(),
+        'cipher': cipher[0] if cipher else None,
+        'certificate': certificates.get(leaf_fingerprint) or {},
+        'fingerprint_sha256': leaf_fingerprint,
+        'chain': chain,
+        'verified': verify_error is None,
+        'verify_error': verify_error
+    }
+    return record, certificates
+
+def unverified_context():
+    """Client context that completes the handshake whatever the certificate."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+def verify_reason(error):
+    """Short reason from an ssl.SSLCertVerificationError."""
+    return getattr(error, 'verify_message', None) or str(error)
+
+def verify_offline(ssl_object, host):
+    """Verify the chain an unverified handshake received against the system
+    trust store and host; None when it checks out, else the reason.
+
+    Needs the cryptography package.
+    """
+    ders = [der for der, _ in _peer_chain(ssl_object, 'get_unverified_chain') or []] \
+        or [ssl_object.getpeercert(binary_form=True)]
+    certificates = [x509.load_der_x509_certificate(der) for der in ders if der]
+    if not certificates:
+        return 'no certificate presented'
+    try:
+        subject = x509.IPAddress(ipaddress.ip_address(host))
+    except ValueError:
+        subject = x509.DNSName(host.rstrip('.').lower())
+    verifier = PolicyBuilder().store(_trust_store()).build_server_verifier(subject)
+    try:
+        verifier.verify(certificates[0], certificates[1:])
+    except VerificationError as e:
+        return str(e)
+    return None
+
+@functools.lru_cache(maxsize=1)
+def _trust_store():
+    # The roots OpenSSL would use: the CA bundle, else the hashed CA directory
+    paths = ssl.get_default_verify_paths()
+    if paths.cafile and os.path.isfile(paths.cafile):
+        files = [paths.cafile]
+    elif paths.capath and os.path.isdir(paths.capath):
+        files = [os.path.join(paths.capath, name) for name in sorted(os.listdir(paths.capath))]
+    else:
+        files = []
+    roots = []
+    for path in files:
+        try:
+            with open(path, 'rb') as f, warnings.catch_warnings():
+                # Some long-lived roots carry serial numbers RFC 5280 disallows
+                warnings.simplefilter('ignore')
+                roots.extend(x509.load_pem_x509_certificates(f.read()))
+        except (OSError, ValueError):
+            continue
+    return Store(roots)
+
+def _peer_chain(ssl_object, method):
+    # Public from Python 3.13; the same methods live on _sslobj since 3.10
+    get_chain = getattr(ssl_object, method, None) \
+        or getattr(getattr(ssl_object, '_sslobj', None), method, None)
+    if get_chain is None:
+        return None
+    try:
+        chain = get_chain()
+    except Exception:
+        return None
+    pairs = []
+    for cert in chain:
+        if isinstance(cert, bytes):
+            # 3.13 returns DER bytes
+            pairs.append((cert, None))
+        else:
+            pairs.append((cert.public_bytes(ssl._ssl.ENCODING_DER), cert.get_info()))
+    return pairs
+
+class TLSProbe:
+    """One TLS handshake per host:port, shared by every caller.
+
+    Results are memoized for `cache_ttl` seconds and concurrent callers for
+    the same endpoint wait on a single handshake. Certificates are stored
+    once per SHA-256 fingerprint in `certificates`, so endpoints behind a
+    shared certificate only reference it. With the cryptography package
+    each endpoint costs one unverified handshake whose chain is verified
+    offline; without it, an endpoint that fails verification (IP address,
+    self-signed, internal CA, expired) is handshaken a second time without
+    verification so its chain is still captured. Either way a failing
+    record has `verified` False and the reason in `verify_error`.
+    """
+
+    MAX_ENDPOINTS = 10000
+
+    def __init__(self, timeout=5.0, workers=32, cache_ttl=300):
+        self.timeout = float(timeout)
+        self.workers = int(workers)
+        self.certificates = {}
+        self._handshakes = ResponseCache(ttl=cache_ttl, max_entries=self.MAX_ENDPOINTS)
+        self._lock = threading.Lock()
+
+    def handshake(self, host, port=443):
+        """Returns {'protocol', 'cipher', 'certificate', 'fingerprint_sha256', 'chain',
+        'verified', 'verify_error'} or raises."""
+        return self._handshakes.get_or_fetch((host.lower(), int(port)), lambda: self._connect(host, port))
+
+    def wrap(self, sock, host, port=443):
+        """TLS-wrap an already connected socket, recording the handshake for host:port.
+
+        With the cryptography package the socket is handshaken once, without
+        verification, and the chain it received verified offline. Otherwise a
+        failed verification spends the socket, and the returned socket is a
+        new unverified connection to the same peer.
+        """
+        if x509 is not None:
+            ssock = unverified_context().wrap_socket(sock, server_hostname=host)
+            return ssock, self.record(ssock, host, port, verify_error=verify_offline(ssock, host))
+        peer = sock.getpeername()[:2]
+        timeout = sock.gettimeout()
+        context = ssl.create_default_context()
+        try:
+            ssock = context.wrap_socket(sock, server_hostname=host)
+        except ssl.SSLCertVerificationError as e:
+            sock.close()
+            ssock = unverified_context().wrap_socket(
+                socket.create_connection(peer, timeout=timeout or self.timeout), server_hostname=host)
+            return ssock, self.record(ssock, host, port, verify_error=verify_reason(e))
+        return ssock, self.record(ssock, host, port)
+
+    def record(self, ssl_object, host=None, port=443, verify_error=None):
+        """Describe a handshake made elsewhere, filing its certificates and,
+        given host, serving it to later handshake() calls for host:port."""
+        record, certificates = describe_connection(ssl_object, verify_error)
+        with self._lock:
+            for fingerprint, info in certificates.items():
+                if self.certificates.get(fingerprint) is None:
+                    self.certificates[fingerprint] = info
+        if host is not None:
+            self._handshakes.offer((host.lower(), int(port)), record)
+        return record
+
+    def chain_summary(self, record):
+        """[{'fingerprint_sha256', 'subject', 'issuer'}] for each certificate of a handshake's chain."""
+        summary = []
+        for fingerprint in record.get('chain', []):
+            info = self.certificates.get(fingerprint) or {}
+            summary.append({
+                'fingerprint_sha256': fingerprint,
+                'subject': dict(x[0] for x in info.get('subject', [])) or None,
+                'issuer': dict(x[0] for x in info.get('issuer', [])) or None
+            })
+        return summary
+
+    def probe_many(self, endpoints):
+        """Handshake (host, port) pairs concurrently.
+
+        Returns {'endpoints': {'host:port': record or {'error'}}, 'certificates':
+        {fingerprint: certificate}} with each distinct certificate listed once.
+        """
+        endpoints = list(dict.fromkeys((host, int(port)) for host, port in endpoints))
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(min(self.workers, len(endpoints)), 1)) as pool:
+            futures = {pool.submit(self.handshake, host, port): (host, port) for host, port in endpoints}
+            for future, (host, port) in futures.items():
+                try:
+                    record = dict(future.result())
+                    record.pop('certificate', None)
+                except Exception as e:
+                    record = {'error': str(e)}
+                results[f'{host}:{port}'] = record
+        fingerprints = {fp for r in results.values() for fp in r.get('chain', [])}
+        with self._lock:
+            certificates = {fp: self.certificates[fp] for fp in fingerprints if fp in self.certificates}
+        return {'endpoints': results, 'certificates': certificates}
+
+    def _connect(self, host, port):
+        if x509 is not None:
+            with socket.create_connection((host, port), timeout=self.timeout) as sock:
+                with unverified_context().wrap_socket(sock, server_hostname=host) as ssock:
+                    return self.record(ssock, verify_error=verify_offline(ssock, host))
+        try:
+            return self._connect_with(ssl.create_default_context(), host, port)
+        except ssl.SSLCertVerificationError as e:
+            return self._connect_with(unverified_context(), host, port, verify_reason(e))
+
+    async def handshake_async(self, host, port=443):
+        """handshake() for coroutines, over a native asyncio connection.
+
+        Shares the handshake cache with handshake() and wrap(), but does not
+        wait on a handshake another thread has in flight.
+        """
+        record = self._handshakes.peek((host.lower(), int(port)))
+        if record is not None:
+            return record
+        if x509 is not None:
+            return await self._connect_async(unverified_context(), host, port, offline=True)
+        try:
+            return await self._connect_async(ssl.create_default_context(), host, port)
+        except ssl.SSLCertVerificationError as e:
+            return await self._connect_async(unverified_context(), host, port, verify_reason(e))
+
+    async def _connect_async(self, context, host, port, verify_error=None, offline=False):
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host), timeout=self.timeout)
+        try:
+            ssl_object = writer.get_extra_info('ssl_object')
+            if offline:
+                verify_error = verify_offline(ssl_object, host)
+            return self.record(ssl_object, host, port, verify_error)
+        finally:
+            writer.close()
+
+    def _connect_with(self, context, host, port, verify_error=None):
+        with socket.create_connection((host, port), timeout=self.timeout) as sock:
+            with context.wrap_socket(sock, server_hostname=host) as ssock:
+                return self.record(ssock, verify_error=verify_error)
+
+    def enumerate_matrix(self, host, port=443):
+        """Find every protocol version and cipher suite host:port accepts.
+
+        Each version is tried in its own handshake, all in parallel, and
+        versions the server refuses are dropped before any cipher work.
+        For each remaining version up to TLS 1.2, the local cipher list is
+        split by key exchange and authentication; a group is offered whole,
+        so a group the server rejects costs one handshake. Groups it accepts
+        are walked by elimination (remove the cipher the server picked and
+        offer the rest again), which also gives the server's preference
+        order within the group. The ssl module cannot restrict TLS 1.3 suites, so for 1.3 only
+        the negotiated suite is reported.
+        """
+        handshakes = [0]
+        counter = threading.Lock()
+
+        def attempt(version, ciphers=None):
+            with counter:
+                handshakes[0] += 1
+            context = self._restricted_context(version, ciphers)
+            with socket.create_connection((host, port), timeout=self.timeout) as sock:
+                with context.wrap_socket(sock, server_hostname=host) as ssock:
+                    return ssock.cipher()[0]
+
+        def try_version(version):
+            try:
+                return version, attempt(version), None
+            except (ssl.SSLError, ValueError):
+                return version, None, None
+            except OSError as e:
+                return version, None, e
+
+        with ThreadPoolExecutor(max_workers=max(min(self.workers, 16), 1)) as pool:
+            outcomes = list(pool.map(try_version, PROTOCOL_VERSIONS))
+            errors = [e for _, _, e in outcomes if e is not None]
+            if len(errors) == len(outcomes):
+                raise errors[0]
+            supported = [(v, cipher) for v, cipher, _ in outcomes if cipher is not None]
+
+            def walk(version, group):
+                accepted = []
+                remaining = list(group)
+                while remaining:
+                    try:
+                        chosen = attempt(version, remaining)
+                    except (ssl.SSLError, OSError, ValueError):
+                        break
+                    if chosen not in remaining:
+                        break
+                    accepted.append(chosen)
+                    remaining.remove(chosen)
+                return version, accepted
+
+            jobs = [pool.submit(walk, version, group)
+                    for version, _ in supported if version != 'TLSv1.3'
+                    for group in self._cipher_groups(version)]
+            ciphers = {version: [] for version, _ in supported}
+            for job in jobs:
+                version, accepted = job.result()
+                ciphers[version].extend(accepted)
+        if 'TLSv1.3' in ciphers:
+            ciphers['TLSv1.3'] = [dict(supported)['TLSv1.3']]
+
+        return {
+            'host': host,
+            'port': port,
+            'versions': {v: v in ciphers for v in PROTOCOL_VERSIONS},
+            'ciphers': ciphers,
+            'handshakes': handshakes[0]
+        }
+
+    @staticmethod
+    def _restricted_context(version, ciphers=None):
+        # Certificate checks are irrelevant here and old versions need SECLEVEL=0
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            tls_version = getattr(ssl.TLSVersion, version.replace('.', '_'))
+            context.minimum_version = tls_version
+            context.maximum_version = tls_version
+        context.set_ciphers((':'.join(ciphers) if ciphers else 'ALL:COMPLEMENTOFALL') + ':@SECLEVEL=0')
+        return context
+
+    @staticmethod
+    def _cipher_groups(version):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.set_ciphers('ALL:COMPLEMENTOFALL:@SECLEVEL=0')
+        level = PROTOCOL_VERSIONS.index(version)
+        groups = {}
+        for cipher in context.get_ciphers():
+            # PSK and SRP suites need shared credentials and can never complete
+            if 'psk' in cipher['kea'] or 'srp' in cipher['kea'] or cipher['auth'] in ('auth-psk', 'auth-srp'):
+                continue
+            if _CIPHER_PROTOCOLS.get(cipher['protocol'], 3) > level or cipher['protocol'] == 'TLSv1.3':
+                continue
+            groups.setdefault((cipher['kea'], cipher['auth']), []).append(cipher['name'])
+        return list(groups.values())
@@ -0,0 +1,185 @@
+"""
+Parallel UDP traceroute
+"""
+
+import re
+import selectors
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+# Linux <linux/errqueue.h> and <linux/in.h> values, missing from older socket modules
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+IPV6_RECVERR = getattr(socket, 'IPV6_RECVERR', 25)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+SO_EE_ORIGIN_ICMP6 = 3
+TIME_EXCEEDED = {SO_EE_ORIGIN_ICMP: 11, SO_EE_ORIGIN_ICMP6: 3}
+
+class Hop:
+    """One TTL of a path: the responding router (or None) and an RTT per query."""
+
+    __slots__ = ('ttl', 'ip', 'rtts')
+
+    def __init__(self, ttl, ip=None, rtts=None):
+        self.ttl = ttl
+        self.ip = ip
+        self.rtts = rtts or []
+
+    def to_dict(self):
+        return {'ttl': self.ttl, 'ip': self.ip,
+                'rtts': [round(r * 1000, 3) if r is not None else None for r in self.rtts]}
+
+    def __str__(self):
+        times = '  '.join(f'{r * 1000:.3f} ms' if r is not None else '*' for r in self.rtts)
+        return f'{self.ttl:2d}  {self.ip or "*"}  {times}'
+
+    def __repr__(self):
+        return f'Hop({self.ttl}, {self.ip!r}, {self.rtts!r})'
+
+class Tracer:
+    """Discover the path to a host by sending every TTL's probes at once.
+
+    Each of `queries` probes per TTL, up to `max_hops`, is a UDP datagram
+    from its own socket with IP_RECVERR set; the ICMP time-exceeded or
+    port-unreachable it provokes lands on that socket's error queue, which
+    identifies the hop without parsing raw ICMP. A whole trace therefore
+    takes about one `timeout` window instead of one per hop. Needs Linux;
+    elsewhere the system traceroute is run instead.
+    """
+
+    def __init__(self, max_hops=30, queries=3, timeout=2.0, port=33434):
+        self.max_hops = int(max_hops)
+        self.queries = max(int(queries), 1)
+        self.timeout = float(timeout)
+        self.port = int(port)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_hops=config.get('traceroute_max_hops', 30),
+            queries=config.get('traceroute_queries', 3),
+            timeout=config.get('traceroute_timeout', 2.0)
+        )
+
+    def trace(self, target):
+        """Returns (hops, reached) with hops past the end of the path trimmed."""
+        family, _, _, _, sockaddr = socket.getaddrinfo(target, None, proto=socket.IPPROTO_UDP)[0]
+        if not sys.platform.startswith('linux'):
+            return self._trace_system(target)
+        try:
+            return self._trace_errqueue(family, sockaddr[0])
+        except OSError:
+            return self._trace_system(target)
+
+    def _trace_errqueue(self, family, ip):
+        if family == socket.AF_INET:
+            level, ttl_option, recverr = socket.IPPROTO_IP, socket.IP_TTL, IP_RECVERR
+        else:
+            level, ttl_option, recverr = socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS, IPV6_RECVERR
+
+        selector = selectors.DefaultSelector()
+        probes = {}
+        rtts = {ttl: [None] * self.queries for ttl in range(1, self.max_hops + 1)}
+        addresses = {}
+        end = None
+        reached = False
+
+        def collect(timeout):
+            nonlocal end, reached
+            for key, _ in selector.select(timeout=timeout):
+                sock = key.fileobj
+                ttl, query, sent = probes.pop(sock)
+                selector.unregister(sock)
+                outcome = self._read_error(sock)
+                sock.close()
+                if outcome is None:
+                    continue
+                offender, kind, origin = outcome
+                rtts[ttl][query] = time.monotonic() - sent
+                addresses.setdefault(ttl, offender)
+                # Anything but time-exceeded (port or admin unreachable) ends the path
+                if kind != TIME_EXCEEDED.get(origin):
+                    end = ttl if end is None else min(end, ttl)
+                    reached = reached or offender == ip
+            # Probes past the end of the path have nothing new to report
+            if end is not None:
+                for sock in [s for s, (t, _, _) in probes.items() if t > end]:
+                    del probes[sock]
+                    selector.unregister(sock)
+                    sock.close()
+
+        try:
+            for ttl in range(1, self.max_hops + 1):
+                if end is not None and ttl > end:
+                    break
+                for query in range(self.queries):
+                    sock = socket.socket(family, socket.SOCK_DGRAM)
+                    sock.setblocking(False)
+                    sock.setsockopt(level, ttl_option, ttl)
+                    sock.setsockopt(level, recverr, 1)
+                    selector.register(sock, selectors.EVENT_READ)
+                    probes[sock] = (ttl, query, time.monotonic())
+                    sock.sendto(b'\0' * 32, (ip, self.port))
+                    # Early hops answer while later probes are still going out; reading them
+                    # now keeps the rest of the send loop out of their RTTs
+                    collect(0)
+
+            deadline = time.monotonic() + self.timeout
+            while probes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                collect(remaining)
+        finally:
+            for sock in probes:
+                sock.close()
+            selector.close()
+
+        last = end or max(addresses, default=0)
+        hops = [Hop(ttl, addresses.get(ttl), rtts[ttl]) for ttl in range(1, last + 1)]
+        return hops, reached
+
+    @staticmethod
+    def _read_error(sock):
+        try:
+            _, ancdata, _, _ = sock.recvmsg(512, 512, MSG_ERRQUEUE)
+        except (BlockingIOError, InterruptedError):
+            return None
+        for level, kind, data in ancdata:
+            if kind not in (IP_RECVERR, IPV6_RECVERR) or len(data) < 16:
+                continue
+            # struct sock_extended_err, followed by the offender's sockaddr
+            _, origin, icmp_type, _, _, _, _ = struct.unpack('=IBBBBII', data[:16])
+            offender = data[16:]
+            if origin == SO_EE_ORIGIN_ICMP and len(offender) >= 8:
+                address = socket.inet_ntop(socket.AF_INET, offender[4:8])
+            elif origin == SO_EE_ORIGIN_ICMP6 and len(offender) >= 24:
+                address = socket.inet_ntop(socket.AF_INET6, offender[8:24])
+            else:
+                continue
+            return address, icmp_type, origin
+        return None
+
+    def _trace_system(self, target):
+        command = ['traceroute', '-q', str(self.queries), '-m', str(self.max_hops), target]
+        if subprocess.os.name == 'nt':
+            command = ['tracert', '-h', str(self.max_hops), target]
+        output = subprocess.run(command, capture_output=True, text=True,
+                                timeout=self.timeout * self.max_hops + 5)
+        hops = parse_traceroute_output(output.stdout)
+        return hops, output.returncode == 0
+
+def parse_traceroute_output(output):
+    """Turn traceroute/tracert text into Hops."""
+    hops = []
+    for line in output.splitlines():
+        match = re.match(r'\s*(\d+)\s+(.*)', line)
+        if not match:
+            continue
+        ips = re.findall(r'\b(\d{1,3}(?:\.\d{1,3}){3}|[0-9a-fA-F]*:[0-9a-fA-F:]+)\b', match.group(2))
+        rtts = [float(t) / 1000 for t in re.findall(r'<?(\d+(?:\.\d+)?)\s*ms', match.group(2))]
+        hops.append(Hop(int(match.group(1)), ips[-1] if ips else None, rtts))
+    return hops